@@ -20,6 +20,18 @@ from .camera import *
 from . import camera
 __all__.extend(camera.__all__)
 
+from .renderer import *
+from . import renderer
+__all__.extend(renderer.__all__)
+
+from .offscreen import *
+from . import offscreen
+__all__.extend(offscreen.__all__)
+
+from .stats import *
+from . import stats
+__all__.extend(stats.__all__)
+
 from .director import *
 from . import director
 __all__.extend(director.__all__)
@@ -28,6 +40,10 @@ from .event import *
 from . import event
 __all__.extend(event.__all__)
 
+from .pacer import *
+from . import pacer
+__all__.extend(pacer.__all__)
+
 from .scheduler import *
 from . import scheduler
 __all__.extend(scheduler.__all__)
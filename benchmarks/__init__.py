@@ -0,0 +1 @@
+# Copyright (C) 2023 zyxkad@gmail.com
@@ -0,0 +1,90 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+# Usage: python -m ag.benchmarks.pipeline [sprites...]
+# Draws the same animation synchronously and on a render thread, and checks the last frames match.
+
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from ..camera import Camera
+from ..nodes import Node, Scene, Layer
+from ..renderer import Renderer, RenderThread
+from ..resources import Color, Colors
+
+import pygame
+
+SCREEN = (1280, 720)
+FRAMES = 30
+
+class _Sprite(Node):
+	def __init__(self, color: Color, **kwargs):
+		super().__init__(**kwargs)
+		self._color = color
+
+	def on_draw(self, surface):
+		surface.fill(self._color)
+
+	def step(self, frame: int):
+		pass
+
+class _Flip(_Sprite):
+	# goes from unrotated to rotated and back, the render thread may still be blitting the unrotated target
+	def step(self, frame: int):
+		self.rotation = 15 if frame % 2 == 0 else 0
+
+class _Spin(_Sprite):
+	def step(self, frame: int):
+		self.rotation = frame * 3 % 360
+
+def _make_scene(n: int) -> tuple[Scene, list[_Sprite]]:
+	scene = Scene()
+	layer = Layer()
+	scene.add_child(layer)
+	w, h = SCREEN
+	random.seed(0)
+	sprites: list[_Sprite] = []
+	for i in range(n):
+		color = Color(random.randrange(256), random.randrange(256), random.randrange(256))
+		sprite = (_Sprite, _Flip, _Spin)[i % 3](color, x=random.uniform(-w / 2, w / 2), y=random.uniform(-h / 2, h / 2),
+			width=96, height=96)
+		layer.add_child(sprite)
+		sprites.append(sprite)
+	return scene, sprites
+
+def bench(n: int, pipelined: bool) -> tuple[float, bytes]:
+	scene, sprites = _make_scene(n)
+	target = pygame.Surface(SCREEN)
+	renderer = Renderer()
+	camera = Camera(0, 0)
+	thread = None
+	if pipelined:
+		thread = RenderThread(renderer)
+		thread.start()
+	start = time.perf_counter()
+	for frame in range(FRAMES):
+		for s in sprites:
+			s.step(frame)
+		if thread is None:
+			renderer.render(scene, target, camera, Colors.white)
+		else:
+			thread.submit(renderer.prepare(scene, target, camera, Colors.white, shared=True))
+	if thread is not None:
+		thread.stop()
+	elapsed = (time.perf_counter() - start) / FRAMES
+	return elapsed, pygame.image.tobytes(target, 'RGB')
+
+def main(counts: list[int]):
+	pygame.init()
+	print(f'{"sprites":>8} {"sync":>12} {"pipelined":>12} {"match":>6}   (ms per frame)')
+	for n in counts:
+		sync, expected = bench(n, False)
+		pipe, pixels = bench(n, True)
+		print(f'{n:>8} {sync * 1e3:>12.2f} {pipe * 1e3:>12.2f} {str(pixels == expected):>6}')
+	pygame.quit()
+
+if __name__ == '__main__':
+	main([int(a) for a in sys.argv[1:]] or [30, 300, 1000])
@@ -0,0 +1,71 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+# Usage: python -m ag.benchmarks.render [counts...]
+
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from ..camera import Camera
+from ..nodes import Node, Scene, Layer
+from ..renderer import Renderer
+from ..resources import Colors
+
+import pygame
+
+SCREEN = (1280, 720)
+FRAMES = 30
+
+class _Sprite(Node):
+	def on_draw(self, surface):
+		surface.fill(Colors.red)
+
+def _make_scene(n: int) -> Scene:
+	scene = Scene()
+	layer = Layer()
+	scene.add_child(layer)
+	w, h = SCREEN
+	for _ in range(n):
+		layer.add_child(_Sprite(x=random.uniform(-w / 2, w / 2), y=random.uniform(-h / 2, h / 2), width=8, height=8))
+	return scene
+
+def _draw_blit(scene: Scene, target: pygame.Surface, camera: Camera):
+	# what the renderer did before batching, anchors converted and one blit call per node
+	cdx = camera.x - SCREEN[0] // 2
+	cdy = camera.y - SCREEN[1] // 2
+	target.fill(Colors.white.rgba)
+	for n in scene._get_display_nodes():
+		if type(n).on_draw is Node.on_draw:
+			continue
+		x, y = n.anchor.convert_pos(n.pos, n.size)
+		target.blit(n._get_render_target().native, (x - cdx, y - cdy))
+
+def bench_frame(n: int, batched: bool) -> float:
+	scene = _make_scene(n)
+	target = pygame.Surface(SCREEN)
+	renderer = Renderer()
+	camera = Camera(0, 0)
+	if batched:
+		draw = lambda: renderer.render(scene, target, camera, Colors.white)
+	else:
+		draw = lambda: _draw_blit(scene, target, camera)
+	# warm up the display list and the render targets
+	draw()
+	start = time.perf_counter()
+	for _ in range(FRAMES):
+		draw()
+	return (time.perf_counter() - start) / FRAMES
+
+def main(counts: list[int]):
+	pygame.init()
+	print(f'{"sprites":>8} {"blit":>12} {"blits":>12}   (ms per frame)')
+	for n in counts:
+		row = [bench_frame(n, batched) * 1e3 for batched in (False, True)]
+		print(f'{n:>8} ' + ' '.join(f'{v:>12.2f}' for v in row))
+	pygame.quit()
+
+if __name__ == '__main__':
+	main([int(a) for a in sys.argv[1:]] or [5000, 20000, 50000])
@@ -0,0 +1,56 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+# Usage: python -m ag.benchmarks.scheduler [counts...]
+
+import random
+import sys
+import time
+
+from ..scheduler import Scheduler, HeapQueue, TimingWheel
+
+def _noop():
+	pass
+
+def bench_insert(n: int, queue) -> float:
+	s = Scheduler(queue())
+	timeouts = [random.random() * 100 for _ in range(n)]
+	start = time.perf_counter()
+	for t in timeouts:
+		s.add_timeout(_noop, t)
+	return time.perf_counter() - start
+
+def bench_fire(n: int, queue) -> float:
+	s = Scheduler(queue())
+	for _ in range(n):
+		s.add_timeout(_noop, random.random() * 100)
+	start = time.perf_counter()
+	# fire the queue over 100 ticks, like a running game would
+	for _ in range(100):
+		s.update(1.0)
+	assert len(s) == 0
+	return time.perf_counter() - start
+
+def bench_cancel(n: int, queue) -> float:
+	s = Scheduler(queue())
+	tasks = [s.add_timeout(_noop, random.random() * 100) for _ in range(n)]
+	random.shuffle(tasks)
+	start = time.perf_counter()
+	for t in tasks:
+		t.cancel()
+	assert len(s) == 0
+	return time.perf_counter() - start
+
+QUEUES = {
+	'heap': HeapQueue,
+	'wheel': lambda: TimingWheel(0.01),
+}
+
+def main(counts: list[int]):
+	print(f'{"queue":>6} {"tasks":>8} {"insert":>12} {"fire":>12} {"cancel":>12}   (ns per task)')
+	for name, queue in QUEUES.items():
+		for n in counts:
+			row = [bench(n, queue) / n * 1e9 for bench in (bench_insert, bench_fire, bench_cancel)]
+			print(f'{name:>6} {n:>8} ' + ' '.join(f'{v:>12.1f}' for v in row))
+
+if __name__ == '__main__':
+	main([int(a) for a in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,71 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+# Usage: python -m ag.benchmarks.tiles [workers...]
+
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from ..camera import Camera
+from ..nodes import Node, Scene, Layer
+from ..renderer import Renderer
+from ..resources import Color, Colors
+
+import pygame
+
+SCREEN = (1920, 1080)
+SPRITES = 4000
+FRAMES = 20
+
+class _Sprite(Node):
+	def __init__(self, color: Color, **kwargs):
+		super().__init__(**kwargs)
+		self._color = color
+
+	def on_draw(self, surface):
+		surface.fill(self._color)
+
+def _make_scene() -> Scene:
+	scene = Scene()
+	layer = Layer()
+	scene.add_child(layer)
+	w, h = SCREEN
+	random.seed(0)
+	for _ in range(SPRITES):
+		color = Color(random.randrange(256), random.randrange(256), random.randrange(256), 0x80)
+		layer.add_child(_Sprite(color, x=random.uniform(-w / 2, w / 2), y=random.uniform(-h / 2, h / 2),
+			width=64, height=64))
+	return scene
+
+def bench_frame(workers: int) -> float:
+	scene = _make_scene()
+	target = pygame.Surface(SCREEN)
+	renderer = Renderer()
+	renderer.workers = workers
+	camera = Camera(0, 0)
+	# warm up the display list, the render targets and the workers
+	renderer.render(scene, target, camera, Colors.white)
+	start = time.perf_counter()
+	for _ in range(FRAMES):
+		renderer.render(scene, target, camera, Colors.white)
+	elapsed = (time.perf_counter() - start) / FRAMES
+	renderer.shutdown()
+	return elapsed
+
+def main(workers: list[int]):
+	pygame.init()
+	print(f'{SPRITES} alpha blended 64x64 sprites at {SCREEN[0]}x{SCREEN[1]}, {os.cpu_count()} cpus')
+	print(f'{"workers":>8} {"ms/frame":>12} {"speedup":>10}')
+	base = None
+	for n in workers:
+		t = bench_frame(n)
+		if base is None:
+			base = t
+		print(f'{n:>8} {t * 1e3:>12.2f} {base / t:>9.2f}x')
+	pygame.quit()
+
+if __name__ == '__main__':
+	main([int(a) for a in sys.argv[1:]] or [1, 2, 4, 8])
@@ -1,17 +1,22 @@
 # Copyright (C) 2023 zyxkad@gmail.com
 
 import enum
+import os
 import sys
 import time
+from time import perf_counter_ns
 
-from .resources import Color, Colors, Vec2, Surface, Anchor
-from .camera import Camera, CameraSurface
-from .nodes import Node, Scene, UILayer
+from .resources import Color, Colors, Vec2
+from .camera import Camera
+from .nodes import Node, Scene
 from .event import (Event, EventTarget, LOWEST_PRIORITY,
 	QuitEvent, UIEvent, LoadEvent,
 	KeyboardEvent, MouseMoveEvent, MouseClickEvent, MouseOverEvent,
 	MOUSE_MAIN_BUTTON)
-from .scheduler import Scheduler, IntervalTask
+from .pacer import JitterStats, FramePacer
+from .renderer import Renderer, RenderThread
+from .stats import FrameStats
+from .scheduler import Scheduler, IntervalPolicy, IntervalTask
 
 import pygame
 
@@ -20,6 +25,27 @@ __all__ = [
 	'Director'
 ]
 
+# the events `Director` handles, the others are blocked so they do not fill up the queue
+_HANDLED_EVENTS = (
+	pygame.QUIT,
+	pygame.KEYDOWN, pygame.KEYUP,
+	pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+	pygame.TEXTEDITING, pygame.TEXTINPUT,
+	pygame.ACTIVEEVENT,
+	pygame.WINDOWENTER, pygame.WINDOWLEAVE,
+	pygame.WINDOWFOCUSGAINED, pygame.WINDOWFOCUSLOST,
+)
+
+# the events which count for `Director.input_latency`
+_INPUT_EVENTS = frozenset((
+	pygame.KEYDOWN, pygame.KEYUP,
+	pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+	pygame.TEXTINPUT,
+))
+
+# how long a single `pygame.event.wait` may block, so a task posted from another thread is not held up for long
+_EVENT_WAIT_SLICE = 4_000_000
+
 
 class QuitBehavior(enum.Enum):
 	EXIT_WHEN_QUIT = enum.auto()
@@ -40,8 +66,30 @@ class Director(EventTarget):
 		pass
 
 	_inited: bool
+	_headless: bool
+	_saved_video_driver: str | None
+	_render: bool
 	_scheduler: Scheduler | None
+	_sim_scheduler: Scheduler | None
 	_fps: float
+	_fixed_timestep: float | None
+	_max_catch_up_steps: int
+	_accumulator: float
+	_alpha: float
+	_renderer: Renderer
+	_pipelined: bool
+	_render_thread: RenderThread | None
+	_wait_events: bool
+	_block_unused_events: bool
+	_input_latency: JitterStats
+	__input_time: int | None
+	_frame_stats: FrameStats
+	__frame_start: int | None
+	__frame_end: int
+	__frame_idle: int
+	__frame_busy: tuple[object, int]
+	__draw_time: int
+	__present_time: int
 	__frames_sec: float
 	__counted_f: int
 	__real_fps: float
@@ -59,8 +107,30 @@ class Director(EventTarget):
 	def __init(cls, self, quit_behavior: QuitBehavior = QuitBehavior.EXIT_WHEN_QUIT):
 		super().__init__(self)
 		self._inited = False
+		self._headless = False
+		self._saved_video_driver = None
+		self._render = True
 		self._scheduler = None
+		self._sim_scheduler = None
 		self._fps = 30.0
+		self._fixed_timestep = None
+		self._max_catch_up_steps = 5
+		self._accumulator = 0.0
+		self._alpha = 1.0
+		self._renderer = Renderer()
+		self._pipelined = False
+		self._render_thread = None
+		self._wait_events = False
+		self._block_unused_events = True
+		self._input_latency = JitterStats()
+		self.__input_time = None
+		self._frame_stats = FrameStats()
+		self.__frame_start = None
+		self.__frame_end = 0
+		self.__frame_idle = 0
+		self.__frame_busy = (None, 0)
+		self.__draw_time = 0
+		self.__present_time = 0
 		self.__frames_sec = 0
 		self.__counted_f = 0
 		self.__real_fps = 0.0
@@ -92,23 +162,35 @@ class Director(EventTarget):
 		assert self._scheduler is not None
 		return self._scheduler
 
+	@property
+	def sim_scheduler(self) -> Scheduler:
+		"""
+		The scheduler the scenes run on, it is stepped at `fixed_timestep` when that is set
+		"""
+		if self._sim_scheduler is not None:
+			return self._sim_scheduler
+		return self.scheduler
+
 	def _end(self):
 		self.scheduler.stop()
 
 	def _loop(self):
 		self.scheduler.loopUntilEmpty()
 
-	def init(self):
+	async def _loop_async(self):
+		await self.scheduler.loop_async()
+
+	def init(self, *, virtual: bool = False):
 		assert not self._inited
 		self._inited = True
-		self._scheduler = Scheduler()
+		self._scheduler = Scheduler(pacer=_EventPacer(self), virtual=virtual)
 		self.__frames_sec = 0
 		self.__counted_f = 0
 		self.__real_fps = 0.0
 		pygame.init()
 
 	def init_with_window(self, size: Vec2 | tuple[float, float], title: str | None = None, *,
-		fps: float = 30.0):
+		fps: float = 30.0, fixed_timestep: float | None = None):
 		self.init()
 		if not isinstance(size, Vec2):
 			size = Vec2(size)
@@ -116,14 +198,61 @@ class Director(EventTarget):
 		if title is not None:
 			self.title = title
 		self.fps = fps
+		self.fixed_timestep = fixed_timestep
+
+	def init_headless(self, size: Vec2 | tuple[float, float] = (640, 480), *,
+		fps: float = 30.0, fixed_timestep: float | None = None,
+		virtual: bool = True, render: bool = True):
+		"""
+		Init without a real window, frames are drawn (unless `render` is False) but never presented.
+		With `virtual` set, the scheduler does not wait for the wall clock,
+		use `run_for` and `step` to drive it.
+		The video driver is switched to dummy until `destroy`.
+		"""
+		saved = os.environ.get('SDL_VIDEODRIVER', None)
+		os.environ['SDL_VIDEODRIVER'] = 'dummy'
+		self.init(virtual=virtual)
+		self._headless = True
+		self._saved_video_driver = saved
+		self._render = render
+		if not isinstance(size, Vec2):
+			size = Vec2(size)
+		self.winsize = size
+		self.fps = fps
+		self.fixed_timestep = fixed_timestep
+
+	@property
+	def headless(self) -> bool:
+		return self._headless
 
 	def destroy(self):
 		if self._inited:
 			self._end()
 			self._inited = False
-			self.pop_scene_to(0)
+			if len(self._scenes) > 0:
+				self.pop_scene_to(0)
+			if self._render_thread is not None:
+				self._render_thread.stop()
+				self._render_thread = None
+			self.scheduler.shutdown(wait=False)
+			if self._sim_scheduler is not None:
+				# in fixed timestep mode the scenes submit their pool work to the sim scheduler
+				self._sim_scheduler.shutdown(wait=False)
 			pygame.quit()
+			if self._headless:
+				# a window opened after this should use the video driver from before
+				if self._saved_video_driver is None:
+					os.environ.pop('SDL_VIDEODRIVER', None)
+				else:
+					os.environ['SDL_VIDEODRIVER'] = self._saved_video_driver
+				self._saved_video_driver = None
 			self._scheduler = None
+			self._headless = False
+			self._render = True
+			self._sim_scheduler = None
+			self._renderer.reset()
+			self._renderer.shutdown(wait=False)
+			self.__input_time = None
 
 	@property
 	def fps(self) -> float:
@@ -151,6 +280,114 @@ class Director(EventTarget):
 	def real_fps(self) -> float:
 		return self.__real_fps
 
+	@property
+	def fixed_timestep(self) -> float | None:
+		return self._fixed_timestep
+
+	@fixed_timestep.setter
+	def fixed_timestep(self, step: float | None):
+		assert step is None or (isinstance(step, (int, float)) and step > 0)
+		assert len(self._scenes) == 0, 'Cannot change fixed timestep while main loop is running'
+		self._fixed_timestep = step
+
+	@property
+	def max_catch_up_steps(self) -> int:
+		return self._max_catch_up_steps
+
+	@max_catch_up_steps.setter
+	def max_catch_up_steps(self, steps: int):
+		assert isinstance(steps, int) and steps > 0
+		self._max_catch_up_steps = steps
+
+	@property
+	def renderer(self) -> Renderer:
+		return self._renderer
+
+	@property
+	def pipelined(self) -> bool:
+		"""
+		Rasterize and present the frames on a render thread, while the main thread goes on with the next frame.
+		Nodes drawing directly are given a render target instead, since their `on_draw` must not run on the render thread.
+		"""
+		return self._pipelined
+
+	@pipelined.setter
+	def pipelined(self, pipelined: bool):
+		assert isinstance(pipelined, bool)
+		assert len(self._scenes) == 0, 'Cannot change pipelining while main loop is running'
+		self._pipelined = pipelined
+
+	@property
+	def dirty_rendering(self) -> bool:
+		"""
+		Only redraw and present the areas of the screen which changed since the last frame,
+		see `Renderer.dirty_rendering`
+		"""
+		return self._renderer.dirty_rendering
+
+	@dirty_rendering.setter
+	def dirty_rendering(self, dirty_rendering: bool):
+		self._renderer.dirty_rendering = dirty_rendering
+
+	@property
+	def dirty_threshold(self) -> float:
+		return self._renderer.dirty_threshold
+
+	@dirty_threshold.setter
+	def dirty_threshold(self, threshold: float):
+		self._renderer.dirty_threshold = threshold
+
+	@property
+	def interpolation(self) -> float:
+		"""
+		How far the rendered frame is between the last two simulation steps, in range [0, 1)
+		It is always 1 when `fixed_timestep` is not set
+		"""
+		return self._alpha
+
+	@property
+	def jitter(self) -> JitterStats:
+		return self.scheduler.pacer.stats
+
+	@property
+	def wait_events(self) -> bool:
+		"""
+		Wait on the event queue instead of sleeping between frames,
+		so an input event is handled as soon as it arrives rather than at the next frame
+		"""
+		return self._wait_events
+
+	@wait_events.setter
+	def wait_events(self, wait_events: bool):
+		assert isinstance(wait_events, bool)
+		self._wait_events = wait_events
+
+	@property
+	def block_unused_events(self) -> bool:
+		"""
+		Block the event types the director does not handle once the main loop starts
+		"""
+		return self._block_unused_events
+
+	@block_unused_events.setter
+	def block_unused_events(self, block: bool):
+		assert isinstance(block, bool)
+		self._block_unused_events = block
+
+	@property
+	def frame_stats(self) -> FrameStats:
+		"""
+		The phase timings of the recent frames, together with how many nodes were drawn and culled
+		"""
+		return self._frame_stats
+
+	@property
+	def input_latency(self) -> JitterStats:
+		"""
+		The time from when the director received an input event until the frame handled it was presented
+		"""
+		return self._input_latency
+
 	@property
 	def winsize(self) -> Vec2:
 		return Vec2(pygame.display.get_window_size())
@@ -214,9 +451,10 @@ class Director(EventTarget):
 	def _get_reachable_node_at(self, x: int, y: int) -> list[tuple[Node, Vec2]]:
 		assert self.current_scene is not None, 'Main loop is not running'
 		pos = Vec2(x, y)
-		cpos = Vec2(self.camera.x - self.winsize.x // 2, self.camera.y - self.winsize.y // 2)
+		# world nodes are under the camera, the ui is not
+		wpos = Vec2(x + self.camera.x - self.winsize.x // 2, y + self.camera.y - self.winsize.y // 2)
 		nodes = self.current_scene._get_reachable_ui_by_pos(pos) or \
-			self.current_scene._get_reachable_nodes_by_pos(cpos)
+			self.current_scene._get_reachable_nodes_by_pos(wpos)
 		return [(self.current_scene, pos)] if nodes is None else nodes
 
 	def __on_mouse_move(self, dx: int, dy: int, x: int, y: int) -> bool:
@@ -313,59 +551,86 @@ class Director(EventTarget):
 		return
 
 	def update(self, dt: float) -> None:
-		e: Event
+		"""
+		Pump the pending input events, it is called right before every frame is drawn
+		"""
 		for event in pygame.event.get():
-			if event.type == pygame.QUIT:
-				self.dispatch(QuitEvent())
-			elif event.type == pygame.KEYDOWN:
-				self._keymap[event.dict['key']] = True
-				e = KeyboardEvent('keydown', self, event.dict['key'], **self.__get_ctrl_keys())
-				self.dispatch(e)
-			elif event.type == pygame.KEYUP:
-				self._keymap[event.dict['key']] = False
-				e = KeyboardEvent('keyup', self, event.dict['key'], **self.__get_ctrl_keys())
-				self.dispatch(e)
-			elif event.type == pygame.MOUSEMOTION:
-				dx, dy = event.dict['rel']
-				x, y = event.dict['pos']
-				self.__on_mouse_move(dx, dy, x, y)
-			elif event.type == pygame.MOUSEBUTTONDOWN:
-				x, y = event.dict['pos']
-				btn = event.dict['button'] - 1
-				assert btn >= 0
-				self.__on_mouse_down(btn, x, y)
-			elif event.type == pygame.MOUSEBUTTONUP:
-				x, y = event.dict['pos']
-				btn = event.dict['button'] - 1
-				assert btn >= 0
-				self.__on_mouse_up(btn, x, y)
-			elif event.type == pygame.TEXTEDITING:
-				self.__on_text_editing(event.dict['text'], event.dict['start'], event.dict['length'])
-			elif event.type == pygame.TEXTINPUT:
-				self.__on_text_input(event.dict['text'])
-			elif event.type == pygame.ACTIVEEVENT:
-				pass # { gain: int-bool, state: 1 for pointer; 2 for focus }
-			elif event.type == pygame.WINDOWENTER:
-				self.dispatch(MouseOverEvent('mouseenter', self, None, **self.__get_ctrl_keys()))
-			elif event.type == pygame.WINDOWLEAVE:
-				kwargs = self.__get_ctrl_keys()
-				self.dispatch(MouseOverEvent('mouseleave', self, None, **kwargs))
-				old_moving = self._mousemoving
-				if old_moving is not None:
-					old_moving.dispatch(MouseOverEvent('mouseleave', old_moving, None,
-						**kwargs))
-					old_moving.dispatch(MouseOverEvent('mouseout', old_moving, None, bubbles=True,
-						**kwargs))
-					self._mousemoving = None
-			elif event.type == pygame.WINDOWFOCUSGAINED:
-				self.dispatch(UIEvent('winfocusin', self))
-			elif event.type == pygame.WINDOWFOCUSLOST:
-				self.dispatch(UIEvent('winfocusout', self))
-			else:
-				print('[DBUG] unknown event:', event.type, event)
+			self._handle_event(event)
 
-	def draw_scene(self, dt: float):
+	def _handle_event(self, event: pygame.event.Event) -> None:
+		e: Event
+		if self.__input_time is None and event.type in _INPUT_EVENTS:
+			self.__input_time = perf_counter_ns()
+		if event.type == pygame.QUIT:
+			self.dispatch(QuitEvent())
+		elif event.type == pygame.KEYDOWN:
+			self._keymap[event.dict['key']] = True
+			e = KeyboardEvent('keydown', self, event.dict['key'], **self.__get_ctrl_keys())
+			self.dispatch(e)
+		elif event.type == pygame.KEYUP:
+			self._keymap[event.dict['key']] = False
+			e = KeyboardEvent('keyup', self, event.dict['key'], **self.__get_ctrl_keys())
+			self.dispatch(e)
+		elif event.type == pygame.MOUSEMOTION:
+			dx, dy = event.dict['rel']
+			x, y = event.dict['pos']
+			self.__on_mouse_move(dx, dy, x, y)
+		elif event.type == pygame.MOUSEBUTTONDOWN:
+			x, y = event.dict['pos']
+			btn = event.dict['button'] - 1
+			assert btn >= 0
+			self.__on_mouse_down(btn, x, y)
+		elif event.type == pygame.MOUSEBUTTONUP:
+			x, y = event.dict['pos']
+			btn = event.dict['button'] - 1
+			assert btn >= 0
+			self.__on_mouse_up(btn, x, y)
+		elif event.type == pygame.TEXTEDITING:
+			self.__on_text_editing(event.dict['text'], event.dict['start'], event.dict['length'])
+		elif event.type == pygame.TEXTINPUT:
+			self.__on_text_input(event.dict['text'])
+		elif event.type == pygame.ACTIVEEVENT:
+			pass # { gain: int-bool, state: 1 for pointer; 2 for focus }
+		elif event.type == pygame.WINDOWENTER:
+			self.dispatch(MouseOverEvent('mouseenter', self, None, **self.__get_ctrl_keys()))
+		elif event.type == pygame.WINDOWLEAVE:
+			kwargs = self.__get_ctrl_keys()
+			self.dispatch(MouseOverEvent('mouseleave', self, None, **kwargs))
+			old_moving = self._mousemoving
+			if old_moving is not None:
+				old_moving.dispatch(MouseOverEvent('mouseleave', old_moving, None,
+					**kwargs))
+				old_moving.dispatch(MouseOverEvent('mouseout', old_moving, None, bubbles=True,
+					**kwargs))
+				self._mousemoving = None
+		elif event.type == pygame.WINDOWFOCUSGAINED:
+			self.dispatch(UIEvent('winfocusin', self))
+		elif event.type == pygame.WINDOWFOCUSLOST:
+			self.dispatch(UIEvent('winfocusout', self))
+		else:
+			print('[DBUG] unknown event:', event.type, event)
+
+	def _step_fixed(self, dt: float):
+		assert self._sim_scheduler is not None
+		assert self._fixed_timestep is not None
+		step = self._fixed_timestep
+		self._accumulator += dt
+		steps = 0
+		while self._accumulator >= step:
+			if steps >= self._max_catch_up_steps:
+				# drop the backlog, otherwise a slow frame makes the next one even slower
+				self._accumulator %= step
+				break
+			self._sim_scheduler.update(step)
+			self._accumulator -= step
+			steps += 1
+			if self.current_scene is None:
+				return
+		self.draw_scene(dt, self._accumulator / step)
+
+	def draw_scene(self, dt: float, alpha: float = 1.0):
 		assert self.current_scene is not None
+		self._alpha = alpha
 
 		self.__frames_sec += dt
 		self.__counted_f += 1
@@ -374,45 +639,78 @@ class Director(EventTarget):
 			self.__frames_sec = 0
 			self.__counted_f = 0
 
-		osurface = pygame.display.get_surface()
-		surface = CameraSurface(self.camera, osurface)
-		surface.fill(self.clear_color)
-		sorigin = Surface(osurface)
-
-		if self.current_scene.visible:
-			s = Surface(sorigin.size)
-			self.current_scene.on_draw(s)
-			sorigin.blit(s, (0, 0), anchor=Anchor.TOP_LEFT)
-			uis: list[Node] = []
-			lys: list[Node] = []
-			for c in self.current_scene.children:
-				if isinstance(c, UILayer):
-					uis.append(c)
-				else:
-					lys.append(c)
-			while len(lys) > 0:
-				n = lys.pop(-1)
-				if not n.visible:
-					continue
-				lys.extend(n.children)
-				if n.width >= 0 and n.height >= 0:
-					s = Surface((n.width, n.height))
-					n.on_draw(s)
-					surface.blit(s, n.pos, anchor=n.anchor)
-			while len(uis) > 0:
-				n = uis.pop(-1)
-				if not n.visible:
-					continue
-				uis.extend(n.children)
-				if isinstance(n, UILayer):
-					s = Surface(sorigin.size)
-					n.on_draw(s)
-					sorigin.blit(s, (0, 0), anchor=Anchor.TOP_LEFT)
-				elif n.width >= 0 and n.height >= 0:
-					s = Surface((n.width, n.height))
-					n.on_draw(s)
-					sorigin.blit(s, n.pos, anchor=n.anchor)
-		pygame.display.update()
+		if not self._render:
+			self.__input_time = None
+			self.__draw_time = 0
+			self.__present_time = 0
+			return
+
+		start = perf_counter_ns()
+		input_time = self.__input_time
+		self.__input_time = None
+		if self._render_thread is not None:
+			draw_list = self._renderer.prepare(self.current_scene, pygame.display.get_surface(), self.camera, self.clear_color,
+				shared=True)
+			drawn = perf_counter_ns()
+			# only waits when the previous frame is not presented yet
+			self._render_thread.submit(draw_list, lambda updated: self.__present(updated, input_time))
+		else:
+			updated = self._renderer.render(self.current_scene, pygame.display.get_surface(), self.camera, self.clear_color)
+			drawn = perf_counter_ns()
+			self.__present(updated, input_time)
+		self.__draw_time = drawn - start
+		self.__present_time = perf_counter_ns() - drawn
+
+	def __present(self, updated: list[pygame.Rect] | None, input_time: int | None):
+		# it runs on the render thread when pipelined
+		if not self._headless:
+			if updated is None:
+				pygame.display.update()
+			elif len(updated) > 0:
+				pygame.display.update(updated)
+		if input_time is not None:
+			self._input_latency._add(perf_counter_ns() - input_time)
+
+	def _frame(self, dt: float):
+		start = perf_counter_ns()
+		idle = self.scheduler.pacer._idle
+		scene = self.current_scene
+		assert scene is not None
+		manager = scene.update_manager
+		busy_manager, busy = self.__frame_busy
+		if busy_manager is not manager:
+			busy = manager._busy
+		# pump the input right before drawing, so the frame shows its effects
+		self.update(dt)
+		pumped = perf_counter_ns()
+		if self.current_scene is None:
+			return
+		# the coroutines waiting for a frame run once per drawn frame
+		self.sim_scheduler.frame()
+		if self.current_scene is None:
+			return
+		self.__draw_time = 0
+		self.__present_time = 0
+		if self._fixed_timestep is None:
+			self.draw_scene(dt)
+		else:
+			self._step_fixed(dt)
+		end = perf_counter_ns()
+
+		last_start = self.__frame_start
+		draw, present = self.__draw_time, self.__present_time
+		updates = manager._busy - busy
+		# whatever ran between the frames without waiting was a scheduler task
+		tasks = 0 if last_start is None else start - self.__frame_end - (idle - self.__frame_idle)
+		tasks += end - pumped - draw - present - updates
+		renderer = self._renderer
+		self._frame_stats._add(pumped - start, max(0, tasks), updates, draw, present,
+			0 if last_start is None else start - last_start,
+			renderer.drawn_count, renderer.culled_count, renderer.allocated_count)
+		self.__frame_start = start
+		self.__frame_end = perf_counter_ns()
+		self.__frame_idle = self.scheduler.pacer._idle
+		self.__frame_busy = (manager, manager._busy)
 
 	@property
 	def scenes(self) -> list[Scene]:
@@ -423,54 +721,109 @@ class Director(EventTarget):
 		return None if len(self._scenes) == 0 else self._scenes[-1]
 
 	def run_with_scene(self, scene: Scene):
+		self.start_with_scene(scene)
+		self._loop()
+
+	async def run_with_scene_async(self, scene: Scene):
+		"""
+		Same as `run_with_scene`, but runs the main loop as a coroutine in the current asyncio event loop
+		"""
+		self.start_with_scene(scene)
+		await self._loop_async()
+
+	def start_with_scene(self, scene: Scene):
+		"""
+		Set up the main loop with `scene` without running it,
+		drive it afterwards with `run_for`, `step` or the scheduler directly.
+		"""
 		assert self._inited, 'Need to be inited'
 		assert len(self._scenes) == 0, 'Main loop is started'
-		self.scheduler.add_interval(self.update, 0.05)
-		self.scheduler.put_task(_FPSTask(self.scheduler.time + self.spf, self.draw_scene, self))
-		scene.scheduler = self.scheduler
+		if self._block_unused_events:
+			pygame.event.set_blocked(None)
+			pygame.event.set_allowed(_HANDLED_EVENTS)
+		if self._fixed_timestep is not None:
+			self._sim_scheduler = Scheduler()
+			self._accumulator = 0.0
+		self.__input_time = None
+		self.__frame_start = None
+		self.__frame_busy = (None, 0)
+		if self._pipelined and self._render and self._render_thread is None:
+			self._render_thread = RenderThread(self._renderer)
+			self._render_thread.start()
+		# a stalled loop should not replay the missed frames
+		self.scheduler.put_task(_FPSTask(self.scheduler.time + self.spf, self._frame, self))
+		self.__enter_scene(scene)
+
+	def __enter_scene(self, scene: Scene):
+		# every scene runs on its own child scheduler, so covering it pauses all of its timers at once
+		scene.scheduler = self.sim_scheduler.create_child()
+		# the sim scheduler only moves in fixed steps, let the updates count them
+		scene.update_manager.fixed_step = self._fixed_timestep
 		self._scenes.append(scene)
 		scene.foreach_child(lambda n: n.dispatch(LoadEvent('load', n)))
-		self._loop()
+
+	def __exit_scene(self, scene: Scene, *, unload: bool = True):
+		if unload:
+			scene.foreach_child(lambda n: n.dispatch(LoadEvent('unload', n)))
+		scheduler = scene._scheduler
+		if scheduler is not None and scheduler.parent is self.sim_scheduler:
+			scheduler.detach()
+			scheduler.clear()
+
+	def __resume_scene(self):
+		scene = self.current_scene
+		if scene is None:
+			self._end()
+			return
+		scheduler = scene.scheduler
+		if scheduler is not None:
+			scheduler.run()
+		scene.foreach_child(lambda n: n.dispatch(LoadEvent('load', n)))
+
+	def run_for(self, seconds: float) -> int:
+		assert self.current_scene is not None, 'Main loop is not started'
+		return self.scheduler.run_for(seconds)
+
+	def step(self, n: int = 1) -> int:
+		assert self.current_scene is not None, 'Main loop is not started'
+		return self.scheduler.step(n)
 
 	def push_scene(self, scene: Scene):
 		old = self.current_scene
 		assert old is not None, 'Cannot use `push_scene` to start main loop'
 		old.foreach_child(lambda n: n.dispatch(LoadEvent('unload', n)))
-		scene.scheduler = self.scheduler
-		self._scenes.append(scene)
-		scene.foreach_child(lambda n: n.dispatch(LoadEvent('load', n)))
+		if old.scheduler is not None:
+			old.scheduler.pause()
+		self.__enter_scene(scene)
 
 	def pop_scene(self):
 		old = self.current_scene
 		assert old is not None, 'Main loop is not running'
-		old.foreach_child(lambda n: n.dispatch(LoadEvent('unload', n)))
 		self._scenes.pop(-1)
-		if len(self._scenes) == 0:
-			self._end()
+		self.__exit_scene(old)
+		self.__resume_scene()
 
 	def pop_scene_to(self, level: int = 1):
 		assert self.current_scene is not None, 'Main loop is not running'
 		assert level >= 0
-		if len(self._scenes) > level:
-			old = self._scenes[-1]
-			old.foreach_child(lambda n: n.dispatch(LoadEvent('unload', n)))
-			while len(self._scenes) > level:
-				self._scenes = self._scenes[:-1]
-		if len(self._scenes) == 0:
-			self._end()
+		if len(self._scenes) <= level:
+			return
+		popped = self._scenes[level:]
+		self._scenes = self._scenes[:level]
+		# only the top scene is loaded, the covered ones were unloaded when they got covered
+		for scene in popped:
+			self.__exit_scene(scene, unload=scene is popped[-1])
+		self.__resume_scene()
 
 	def replace_scene(self, scene: Scene):
 		assert self.current_scene is not None, 'Main loop is not running'
-		old = self._scenes[-1]
-		old.foreach_child(lambda n: n.dispatch(LoadEvent('unload', n)))
-		self._scenes.pop(-1)
-		scene.foreach_child(lambda n: n.dispatch(LoadEvent('load', n)))
-		scene.scheduler = self.scheduler
-		self._scenes[-1] = scene
+		old = self._scenes.pop(-1)
+		self.__exit_scene(old)
+		self.__enter_scene(scene)
 
 class _FPSTask(IntervalTask):
 	def __init__(self, start: float, cb, director: Director):
-		super().__init__(start, director.spf, cb)
+		super().__init__(start, director.spf, cb, policy=IntervalPolicy.SKIP)
 		self._director = director
 
 	@property
@@ -480,3 +833,32 @@ class _FPSTask(IntervalTask):
 	@property
 	def interval(self) -> float:
 		return self.director.spf
+
+class _EventPacer(FramePacer):
+	"""
+	Waits on the pygame event queue when `Director.wait_events` is set,
+	and hands the received events to the director right away.
+	"""
+
+	def __init__(self, director: Director):
+		super().__init__()
+		self._director = director
+
+	def _sleep(self, timeout: int, wakeup) -> bool:
+		director = self._director
+		if not director._wait_events or director.current_scene is None:
+			return super()._sleep(timeout, wakeup)
+		deadline = perf_counter_ns() + timeout
+		while True:
+			remain = deadline - perf_counter_ns()
+			if remain <= 0:
+				return False
+			event = pygame.event.wait(max(1, min(remain, _EVENT_WAIT_SLICE) // 1_000_000))
+			if event.type != pygame.NOEVENT:
+				start = perf_counter_ns()
+				director._handle_event(event)
+				# handling the event is not waiting
+				self._idle -= perf_counter_ns() - start
+				return True
+			if wakeup is not None and wakeup.is_set():
+				return True
@@ -147,17 +147,29 @@ class EventTarget:
 		event._current_target = self
 		captures, bubbles = self._listeners[event.type]
 		if capture is not False:
-			for s in captures:
+			for s in tuple(captures):
+				if s.once and not self.__remove_once(captures, s):
+					continue
 				dyn_call(s.callback, event)
 				if event.cancelable and event.canceled:
 					return False
 		if capture is not True:
-			for s in bubbles:
+			for s in tuple(bubbles):
+				if s.once and not self.__remove_once(bubbles, s):
+					continue
 				dyn_call(s.callback, event)
 				if event.cancelable and event.canceled:
 					return False
 		return True
 
+	def __remove_once(self, listeners: list[_Subscriber], s: _Subscriber) -> bool:
+		with self._lock:
+			for i, l in enumerate(listeners):
+				if l is s:
+					listeners.pop(i)
+					return True
+		return False
+
 	def register(self, etype: str, cb: EventCallback, *,
 		priority: int | _EndlessPriority = 0, once: bool = False,
 		capture: bool = False) -> EventCallback:
@@ -2,6 +2,10 @@
 
 __all__ = []
 
+from .update import *
+from . import update
+__all__.extend(update.__all__)
+
 from .node import *
 from . import node
 __all__.extend(node.__all__)
@@ -3,11 +3,13 @@
 from __future__ import annotations
 
 from typing import TypeVar, Generic, Callable
+import math
 
 from ..event import on, Event, EventTarget, LoadEvent
 from ..scheduler import *
 from ..resources import Vec2, Surface, Anchor
 from ..utils import *
+from .update import UpdatePhase, UpdateManager
 
 import pygame
 
@@ -46,9 +48,36 @@ class Node(EventTarget):
 		self._focusing = False
 		self._loaded = False
 		self._cursors: list[pygame.Cursor] = []
+		self._dirty = True
+		self._content_dirty = True
+		self._render_target: Surface | None = None
+		self._render_size = (0, 0)
+		# bumped every time the render target is drawn again
+		self._render_version = 0
+		# the last frame shared with a render thread which referenced the render target
+		self._render_shared = 0
+		self._draw_direct = False
+		self._blend_flags = 0
+		self._anchor_offset: tuple[float, float] | None = None
+		self._bounds: pygame.Rect | None = None
+		# cached world transform as an affine matrix (a, b, c, d, tx, ty), see `_get_world`
+		self._world: tuple[float, float, float, float, float, float] | None = None
+		self._world_inverse: tuple[float, float, float, float, float, float] | None = None
+		self._world_rect: pygame.Rect | None = None
+		# nodes of the subtree in drawing order, see `_get_display_nodes`
+		self._display_nodes: list[Node] | None = None
+		self._cache_as_bitmap = False
+		# the cached subtree, the rect it covers and the world transform it was drawn with
+		self._bitmap: pygame.Surface | None = None
+		self._bitmap_valid = False
+		self._bitmap_rect: pygame.Rect | None = None
+		self._bitmap_world: tuple[float, float, float, float, float, float] | None = None
 
 		self._schedule_upadate_interval: float | None = None
-		self._update_task = None
+		self._update_phase = UpdatePhase.UPDATE
+		self._update_priority = 0
+		self._update_manager: UpdateManager | None = None
+		self._registered_manager: UpdateManager | None = None
 
 	def dispatch(self, event: Event, capture: bool | None = None):
 		nodes = self.parents
@@ -78,14 +107,42 @@ class Node(EventTarget):
 
 	@property
 	def scheduler(self) -> Scheduler | None:
-		return self._scheduler or (None if self.parent is None else self.parent.scheduler)
+		if self._scheduler is not None:
+			return self._scheduler
+		return None if self.parent is None else self.parent.scheduler
 
 	@scheduler.setter
 	def scheduler(self, scheduler: Scheduler):
 		self._scheduler = scheduler
 
-	def schedule_update(self, interval: float | None = 0.05):
+	@property
+	def update_manager(self) -> UpdateManager:
+		if self.parent is not None:
+			return self.parent.update_manager
+		if self._update_manager is None:
+			self._update_manager = UpdateManager(self)
+		return self._update_manager
+
+	def schedule_update(self, interval: float | None = 0.05, *,
+		phase: UpdatePhase = UpdatePhase.UPDATE, priority: int = 0):
 		self._schedule_upadate_interval = interval
+		self._update_phase = phase
+		self._update_priority = priority
+		if self.loaded:
+			self.__register_update()
+
+	def unschedule_update(self):
+		self.schedule_update(None)
+
+	def __register_update(self):
+		if self._registered_manager is not None:
+			self._registered_manager.unregister(self)
+			self._registered_manager = None
+		if self._schedule_upadate_interval is not None:
+			manager = self.update_manager
+			manager.register(self, self._schedule_upadate_interval,
+				phase=self._update_phase, priority=self._update_priority)
+			self._registered_manager = manager
 
 	@property
 	def x(self) -> float:
@@ -95,6 +152,8 @@ class Node(EventTarget):
 	def x(self, x: float):
 		assert isinstance(x, (int, float))
 		self.__x = x
+		self.invalidate(content=False)
+		self._invalidate_transform()
 
 	@property
 	def y(self) -> float:
@@ -104,6 +163,8 @@ class Node(EventTarget):
 	def y(self, y: float):
 		assert isinstance(y, (int, float))
 		self.__y = y
+		self.invalidate(content=False)
+		self._invalidate_transform()
 
 	@property
 	def pos(self) -> Vec2:
@@ -117,6 +178,10 @@ class Node(EventTarget):
 	def width(self, width: float):
 		assert isinstance(width, (int, float))
 		self.__width = width
+		self._anchor_offset = None
+		self._world_rect = None
+		self._invalidate_bounds()
+		self.invalidate()
 
 	@property
 	def height(self) -> float:
@@ -126,6 +191,10 @@ class Node(EventTarget):
 	def height(self, height: float):
 		assert isinstance(height, (int, float))
 		self.__height = height
+		self._anchor_offset = None
+		self._world_rect = None
+		self._invalidate_bounds()
+		self.invalidate()
 
 	@property
 	def size(self) -> Vec2:
@@ -138,6 +207,11 @@ class Node(EventTarget):
 	@anchor.setter
 	def anchor(self, anchor: Anchor):
 		self.__anchor = anchor
+		self._anchor_offset = None
+		self._world_rect = None
+		self._invalidate_bounds()
+		self._invalidate_bitmap()
+		self.invalidate(content=False)
 
 	@property
 	def z_index(self) -> int:
@@ -146,7 +220,17 @@ class Node(EventTarget):
 	@z_index.setter
 	def z_index(self, z_index: int):
 		assert isinstance(z_index, int)
+		if z_index == self._z_index:
+			return
 		self._z_index = z_index
+		parent = self._parent
+		if parent is not None:
+			# keep the siblings sorted, an updated node goes after the ones with the same z index
+			parent._children.remove(self)
+			i = binSearch(parent._children, lambda c: -1 if c.z_index <= z_index else 1)
+			parent._children.insert(i, self)
+			parent._invalidate_display()
+		self.invalidate(content=False)
 
 	@property
 	def scaleX(self) -> float:
@@ -156,6 +240,8 @@ class Node(EventTarget):
 	def scaleX(self, scaleX: float):
 		assert isinstance(scaleX, (int, float))
 		self._scaleX = scaleX
+		self.invalidate(content=False)
+		self._invalidate_transform()
 
 	@property
 	def scaleY(self) -> float:
@@ -165,6 +251,8 @@ class Node(EventTarget):
 	def scaleY(self, scaleY: float):
 		assert isinstance(scaleY, (int, float))
 		self._scaleY = scaleY
+		self.invalidate(content=False)
+		self._invalidate_transform()
 
 	@property
 	def scale(self) -> Vec2:
@@ -177,15 +265,38 @@ class Node(EventTarget):
 	@visible.setter
 	def visible(self, visible: bool):
 		assert isinstance(visible, bool)
+		if visible == self._visible:
+			return
 		self._visible = visible
+		if self._parent is not None:
+			self._parent._invalidate_display()
+		self.invalidate(content=False)
+
+	@property
+	def blend_flags(self) -> int:
+		"""
+		The `pygame.BLEND_*` flags used when the node is blitted onto the screen
+		"""
+		return self._blend_flags
+
+	@blend_flags.setter
+	def blend_flags(self, flags: int):
+		assert isinstance(flags, int)
+		self._blend_flags = flags
+		self.invalidate(content=False)
 
 	@property
 	def rotation(self) -> float:
+		"""
+		Clockwise rotation around `pos` in degrees
+		"""
 		return self._rotation
 
 	@rotation.setter
 	def rotation(self, rotation: float):
 		self._rotation = rotation
+		self.invalidate(content=False)
+		self._invalidate_transform()
 
 	@property
 	def selectable(self) -> bool:
@@ -246,6 +357,8 @@ class Node(EventTarget):
 		i = binSearch(self._children, lambda c: -1 if c.z_index <= child.z_index else 1)
 		child._parent = self
 		self._children.insert(i, child)
+		child._invalidate_transform()
+		self._invalidate_display()
 		if self.loaded:
 			child.dispatch(LoadEvent('load', child))
 
@@ -274,27 +387,37 @@ class Node(EventTarget):
 		return None
 
 	def reachable(self, pos: Vec2) -> bool:
+		"""
+		`pos` is local to the node, the area is offset by the anchor and excludes the right and bottom edges,
+		the same as the rect the renderer draws it at
+		"""
 		if not self.visible:
 			return False
-		pos = self.anchor.convert_pos(pos, self.size, reversed=True)
-		return Vec2.ZERO <= pos and pos <= self.size
+		ox, oy = self._get_anchor_offset()
+		x, y = pos.x - ox, pos.y - oy
+		return 0 <= x < self.__width and 0 <= y < self.__height
 
 	def _get_reachable_nodes_by_pos(self, pos: Vec2) -> list[tuple[Node, Vec2]] | None:
+		"""
+		`pos` is in world space, the returned positions are local to each node
+		"""
 		if not self.visible:
 			return None
 		for c in reversed(self._children):
-			npos = pos - c.pos
-			n = c._get_reachable_nodes_by_pos(npos)
+			n = c._get_reachable_nodes_by_pos(pos)
 			if n is not None:
-				n.append((self, pos))
+				n.append((self, self.world_to_local(pos)))
 				return n
-		return [(self, pos)] if self.reachable(pos) else None
+		local = self.world_to_local(pos)
+		return [(self, local)] if self.reachable(local) else None
 
 	def __remove_child_by_index(self, i: int):
 		child = self._children[i]
 		child.dispatch(LoadEvent('unload', child))
 		self._children.pop(i)
 		child._parent = None
+		child._invalidate_transform()
+		self._invalidate_display()
 
 	def remove_child(self, child: Node):
 		assert isinstance(child, Node)
@@ -340,6 +463,225 @@ class Node(EventTarget):
 		pygame.mouse.set_cursor(c)
 		return c
 
+	@property
+	def dirty(self) -> bool:
+		return self._dirty
+
+	def invalidate(self, *, content: bool = True):
+		"""
+		Mark the node to be redrawn at the next frame,
+		call it whenever `on_draw` would draw something different.
+		With `content` unset only the area it covers is repainted, `on_draw` is not called again.
+		"""
+		self._dirty = True
+		if content:
+			self._content_dirty = True
+		# a cached bitmap only follows the moves of its own node
+		self._invalidate_bitmap(content)
+
+	@property
+	def cache_as_bitmap(self) -> bool:
+		"""
+		Draw the node and all of its descendants once into a bitmap and blit only the bitmap every frame,
+		it is drawn again when any of them changes. Suits static layers holding many nodes.
+		Translucent descendants are blended onto the transparent bitmap first, where they overlap they may look slightly different.
+		"""
+		return self._cache_as_bitmap
+
+	@cache_as_bitmap.setter
+	def cache_as_bitmap(self, cache: bool):
+		assert isinstance(cache, bool)
+		self._cache_as_bitmap = cache
+		self._bitmap = None
+		self._bitmap_valid = False
+		self._invalidate_bitmap(False)
+		self.invalidate(content=False)
+
+	def _invalidate_bitmap(self, include_self: bool = True):
+		n = self if include_self else self._parent
+		while n is not None:
+			n._bitmap_valid = False
+			n = n._parent
+
+	@property
+	def draw_direct(self) -> bool:
+		"""
+		Call `on_draw` every frame straight onto the screen instead of caching the result in a render target,
+		the surface it gets is offset to the node and clipped to its size.
+		"""
+		return self._draw_direct
+
+	@draw_direct.setter
+	def draw_direct(self, draw_direct: bool):
+		assert isinstance(draw_direct, bool)
+		self._draw_direct = draw_direct
+		self._render_target = None
+		self.invalidate()
+
+	def _get_anchor_offset(self) -> tuple[float, float]:
+		"""
+		Return where the top left corner is relative to `pos`
+		"""
+		offset = self._anchor_offset
+		if offset is None:
+			offset = self.__anchor.convert_pos(Vec2.ZERO, self.size).xy
+			self._anchor_offset = offset
+		return offset
+
+	def _invalidate_display(self):
+		n = self
+		# an unset list means all of its parents are unset as well
+		while n is not None and n._display_nodes is not None:
+			n._display_nodes = None
+			n = n._parent
+		self._invalidate_bounds()
+		self._invalidate_bitmap()
+
+	def _invalidate_bounds(self):
+		n = self
+		while n is not None and n._bounds is not None:
+			n._bounds = None
+			n = n._parent
+
+	def _invalidate_transform(self):
+		# clear the ancestors first, the walk below clears the bounds of `self` which would stop it
+		self._invalidate_bounds()
+		if self._world is not None:
+			# a node without a world transform has none of its descendants' either
+			stack = [self]
+			while len(stack) > 0:
+				n = stack.pop()
+				if n._world is None:
+					continue
+				n._world = None
+				n._world_inverse = None
+				n._world_rect = None
+				n._bounds = None
+				stack.extend(n._children)
+
+	def _get_world(self) -> tuple[float, float, float, float, float, float]:
+		"""
+		Return the affine matrix (a, b, c, d, tx, ty) which maps a local point (x, y)
+		to (a * x + c * y + tx, b * x + d * y + ty) in world space
+		"""
+		world = self._world
+		if world is None:
+			x, y = self.__x, self.__y
+			sx, sy = self._scaleX, self._scaleY
+			if self._rotation == 0:
+				a, b, c, d = sx, 0.0, 0.0, sy
+			else:
+				r = math.radians(self._rotation)
+				cos, sin = math.cos(r), math.sin(r)
+				a, b, c, d = cos * sx, sin * sx, -sin * sy, cos * sy
+			parent = self._parent
+			if parent is None:
+				world = (a, b, c, d, x, y)
+			else:
+				pa, pb, pc, pd, ptx, pty = parent._get_world()
+				world = (pa * a + pc * b, pb * a + pd * b, pa * c + pc * d, pb * c + pd * d,
+					pa * x + pc * y + ptx, pb * x + pd * y + pty)
+			self._world = world
+		return world
+
+	def _get_world_rect(self) -> pygame.Rect:
+		"""
+		Return the axis aligned rect the node covers in world space
+		"""
+		rect = self._world_rect
+		if rect is None:
+			a, b, c, d, tx, ty = self._get_world()
+			ox, oy = self._get_anchor_offset()
+			w, h = self.__width, self.__height
+			if a == 1 and b == 0 and c == 0 and d == 1:
+				rect = pygame.Rect(tx + ox, ty + oy, w, h)
+			else:
+				xs = [a * px + c * py + tx for px, py in ((ox, oy), (ox + w, oy), (ox, oy + h), (ox + w, oy + h))]
+				ys = [b * px + d * py + ty for px, py in ((ox, oy), (ox + w, oy), (ox, oy + h), (ox + w, oy + h))]
+				left, top = math.floor(min(xs)), math.floor(min(ys))
+				rect = pygame.Rect(left, top, math.ceil(max(xs)) - left, math.ceil(max(ys)) - top)
+			self._world_rect = rect
+		return rect
+
+	@property
+	def world_transform(self) -> tuple[float, float, float, float, float, float]:
+		"""
+		The cached affine matrix (a, b, c, d, tx, ty) from the local space of the node to world space,
+		the local origin is at `pos` of the node.
+		"""
+		return self._get_world()
+
+	@property
+	def world_pos(self) -> Vec2:
+		_, _, _, _, tx, ty = self._get_world()
+		return Vec2(tx, ty)
+
+	def local_to_world(self, pos: Vec2 | tuple[float, float]) -> Vec2:
+		a, b, c, d, tx, ty = self._get_world()
+		x, y = pos
+		return Vec2(a * x + c * y + tx, b * x + d * y + ty)
+
+	def world_to_local(self, pos: Vec2 | tuple[float, float]) -> Vec2:
+		inverse = self._world_inverse
+		if inverse is None:
+			a, b, c, d, tx, ty = self._get_world()
+			det = a * d - b * c
+			if det == 0:
+				# a node scaled to nothing does not contain any point
+				inverse = (math.nan,) * 6
+			else:
+				ia, ib, ic, id = d / det, -b / det, -c / det, a / det
+				inverse = (ia, ib, ic, id, -(ia * tx + ic * ty), -(ib * tx + id * ty))
+			self._world_inverse = inverse
+		a, b, c, d, tx, ty = inverse
+		x, y = pos
+		return Vec2(a * x + c * y + tx, b * x + d * y + ty)
+
+	def _get_bounds(self) -> pygame.Rect:
+		"""
+		Return the rect covering the node and all of its visible descendants
+		"""
+		bounds = self._bounds
+		if bounds is None:
+			bounds = self._get_world_rect().copy()
+			rects = [c._get_bounds() for c in self._children if c._visible]
+			# an empty node like a layer should not stretch the bounds to its position
+			rects = [r for r in rects if r]
+			if len(rects) > 0:
+				bounds = bounds.unionall(rects) if bounds else rects[0].unionall(rects[1:])
+			self._bounds = bounds
+		return bounds
+
+	def _get_display_nodes(self) -> list[Node]:
+		"""
+		Return the visible nodes of the subtree in drawing order,
+		only the subtrees which changed since the last call are walked again.
+		"""
+		nodes = self._display_nodes
+		if nodes is None:
+			nodes = [self]
+			for c in self._children:
+				if c._visible:
+					nodes.extend(c._get_display_nodes())
+			self._display_nodes = nodes
+		return nodes
+
+	def _get_render_target(self, size: tuple[int, int] | None = None) -> Surface:
+		target = self._render_target
+		if size is None:
+			size = (int(self.__width), int(self.__height))
+		if target is None or self._render_size != size:
+			target = Surface(size)
+			self._render_target = target
+			self._render_size = size
+			self._content_dirty = True
+		if self._content_dirty:
+			self._content_dirty = False
+			self._render_version += 1
+			target.native.fill((0, 0, 0, 0))
+			self.on_draw(target)
+		return target
+
 	def on_draw(self, surface: Surface):
 		pass
 
@@ -349,17 +691,17 @@ class Node(EventTarget):
 	@on('load')
 	def __on_load(self, event: LoadEvent):
 		self._loaded = True
-		if self._schedule_upadate_interval is not None:
-			print(self, 'loading')
-			assert self.scheduler is not None
-			self.scheduler.add_interval(self.on_update, self._schedule_upadate_interval)
+		self.__register_update()
 
 	@on('unload')
 	def __on_unload(self, event: LoadEvent):
 		self._loaded = False
-		if self._update_task is not None:
-			self._update_task.cancel()
-			self._update_task = None
+		self._render_target = None
+		self._bitmap = None
+		self._bitmap_valid = False
+		if self._registered_manager is not None:
+			self._registered_manager.unregister(self)
+			self._registered_manager = None
 
 	def foreach_child(self, callback: Callable[[Node], None], /, *, reverse: bool = False):
 		if reverse:
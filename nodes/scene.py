@@ -17,6 +17,10 @@ class UILayer(Layer):
 	pass
 
 class Scene(Node):
+	def __init__(self, **kwargs):
+		super().__init__(**kwargs)
+		self._ui_start = 0
+
 	@property
 	def is_active(self) -> bool:
 		return self.loaded
@@ -25,8 +29,7 @@ class Scene(Node):
 		if self.visible:
 			for c in reversed(self._children):
 				if isinstance(c, UILayer):
-					npos = pos - c.pos
-					n = c._get_reachable_nodes_by_pos(npos)
+					n = c._get_reachable_nodes_by_pos(pos)
 					if n is not None:
 						n.append((self, pos))
 						return n
@@ -36,9 +39,23 @@ class Scene(Node):
 		if self.visible:
 			for c in reversed(self._children):
 				if not isinstance(c, UILayer):
-					npos = pos - c.pos
-					n = c._get_reachable_nodes_by_pos(npos)
+					n = c._get_reachable_nodes_by_pos(pos)
 					if n is not None:
 						n.append((self, pos))
 						return n
 		return None
+
+	def _get_display_nodes(self) -> list[Node]:
+		nodes = self._display_nodes
+		if nodes is None:
+			nodes = [self]
+			uis: list[Node] = []
+			for c in self._children:
+				if c._visible:
+					(uis if isinstance(c, UILayer) else nodes).extend(c._get_display_nodes())
+			# the ui layers are drawn above the world without the camera offset
+			self._ui_start = len(nodes)
+			nodes.extend(uis)
+			self._display_nodes = nodes
+		return nodes
+
@@ -42,6 +42,7 @@ class Button(UINode):
 	@disabled.setter
 	def disabled(self, disabled: bool):
 		self.__disabled = disabled
+		self.invalidate()
 
 	@property
 	def hovering(self) -> bool:
@@ -58,6 +59,7 @@ class Button(UINode):
 	@idle_texture.setter
 	def idle_texture(self, texture: Texture | None):
 		self._idle_texture = texture
+		self.invalidate()
 
 	@property
 	def disable_texture(self) -> Texture | None:
@@ -66,6 +68,7 @@ class Button(UINode):
 	@disable_texture.setter
 	def disable_texture(self, texture: Texture | None):
 		self._disable_texture = texture
+		self.invalidate()
 
 	@property
 	def hover_texture(self) -> Texture | None:
@@ -74,6 +77,7 @@ class Button(UINode):
 	@hover_texture.setter
 	def hover_texture(self, texture: Texture | None):
 		self._hover_texture = texture
+		self.invalidate()
 
 	@property
 	def click_texture(self) -> Texture | None:
@@ -82,6 +86,7 @@ class Button(UINode):
 	@click_texture.setter
 	def click_texture(self, texture: Texture | None):
 		self._click_texture = texture
+		self.invalidate()
 
 	def get_texture(self) -> Texture | None:
 		if self.disabled:
@@ -97,6 +102,7 @@ class Button(UINode):
 		self.__hovering = True
 		if event.is_button_down(MOUSE_MAIN_BUTTON):
 			self.__clicking = True
+		self.invalidate()
 		self.push_cursor(pygame.SYSTEM_CURSOR_HAND)
 
 	@on('unload')
@@ -104,17 +110,20 @@ class Button(UINode):
 	def __on_mouse_leave(self) -> None:
 		self.__hovering = False
 		self.__clicking = False
+		self.invalidate()
 		self.pop_cursor()
 
 	@on('mousedown')
 	def __on_mouse_down(self, event: MouseClickEvent) -> None:
 		if not self.disabled and event.button == MOUSE_MAIN_BUTTON:
 			self.__clicking = True
+			self.invalidate()
 
 	@on('mouseup')
 	def __on_mouse_up(self, event: MouseClickEvent) -> None:
 		if self.__clicking and event.button == MOUSE_MAIN_BUTTON:
 			self.__clicking = False
+			self.invalidate()
 			self.on_click()
 
 	def on_click(self) -> None:
@@ -0,0 +1,263 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+from __future__ import annotations
+
+import enum
+from time import perf_counter_ns
+from typing import TYPE_CHECKING
+
+from ..scheduler import Scheduler, Task
+
+if TYPE_CHECKING:
+	from .node import Node
+
+__all__ = [
+	'UpdatePhase',
+	'UpdateManager',
+]
+
+# groups due within this many seconds of a tick run in it, so float error does not split the groups due together
+_DUE_EPSILON = 1e-9
+
+class UpdatePhase(enum.IntEnum):
+	PRE_UPDATE = 0
+	UPDATE = 1
+	LATE_UPDATE = 2
+
+class _UpdateBucket:
+	__slots__ = ('phase', 'priority', 'nodes', 'index', 'holes')
+
+	def __init__(self, phase: UpdatePhase, priority: int):
+		self.phase = phase
+		self.priority = priority
+		self.nodes: list[Node | None] = []
+		self.index: dict[Node, int] = {}
+		self.holes = 0
+
+	def sort_key(self) -> tuple[int, int]:
+		# higher priorities run first inside the same phase
+		return self.phase, -self.priority
+
+	def add(self, node: Node):
+		self.index[node] = len(self.nodes)
+		self.nodes.append(node)
+
+	def remove(self, node: Node, ticking: bool):
+		i = self.index.pop(node)
+		if ticking:
+			# keep the array stable while it is being iterated
+			self.nodes[i] = None
+			self.holes += 1
+			return
+		last = self.nodes.pop()
+		if last is not node:
+			assert last is not None
+			self.nodes[i] = last
+			self.index[last] = i
+
+	def compact(self):
+		if self.holes == 0:
+			return
+		self.nodes = [n for n in self.nodes if n is not None]
+		self.index = {n: i for i, n in enumerate(self.nodes)}
+		self.holes = 0
+
+	def __len__(self) -> int:
+		return len(self.index)
+
+class _UpdateGroup:
+	def __init__(self, manager: UpdateManager, interval: float, now: float):
+		self._manager = manager
+		self._interval = interval
+		self._buckets: dict[tuple[UpdatePhase, int], _UpdateBucket] = {}
+		self._order: list[_UpdateBucket] = []
+		self._next = now + interval
+		self._last: float = -1
+		# where the fixed steps are counted from, see `UpdateManager.fixed_step`
+		self._base = now
+
+	@property
+	def interval(self) -> float:
+		return self._interval
+
+	def __len__(self) -> int:
+		return sum(len(b) for b in self._order)
+
+	def add(self, node: Node, phase: UpdatePhase, priority: int):
+		key = (phase, priority)
+		bucket = self._buckets.get(key, None)
+		if bucket is None:
+			bucket = _UpdateBucket(phase, priority)
+			self._buckets[key] = bucket
+			# do not mutate the list in place, it may be iterating
+			self._order = sorted(self._order + [bucket], key=_UpdateBucket.sort_key)
+		bucket.add(node)
+
+	def remove(self, node: Node, phase: UpdatePhase, priority: int):
+		bucket = self._buckets[(phase, priority)]
+		bucket.remove(node, self._manager._ticking)
+		if not self._manager._ticking:
+			self._drop_empty()
+
+	def _drop_empty(self):
+		for bucket in self._order:
+			bucket.compact()
+			if len(bucket) == 0:
+				del self._buckets[(bucket.phase, bucket.priority)]
+		self._order = [b for b in self._order if len(b) > 0]
+
+	def due(self, now: float) -> float | None:
+		"""
+		Return the dt to tick with if the group is due at `now`
+		"""
+		step = self._manager.fixed_step
+		if step is not None:
+			# count the whole steps on the clock instead of comparing float times,
+			# the scheduler may also tick without moving it
+			steps = round((now - self._base) / step)
+			if steps < max(1, round(self._interval / step)):
+				return None
+			self._base += steps * step
+			return steps * step
+		if now < self._next - _DUE_EPSILON:
+			return None
+		dt = now - self._last if self._last >= 0 else 0
+		self._last = now
+		self._next = now + self._interval
+		return dt
+
+class UpdateManager:
+	"""
+	Ticks the `on_update` of every loaded node below its owner with a single scheduler task.
+	Nodes sharing the same update interval are grouped, and all the groups due in the same tick
+	run their nodes together ordered by phase and priority.
+	"""
+
+	def __init__(self, owner: Node):
+		self._owner = owner
+		self._groups: dict[float, _UpdateGroup] = {}
+		self._registered: dict[Node, tuple[float, UpdatePhase, int]] = {}
+		self._busy = 0
+		self._fixed_step: float | None = None
+		self._task: Task | None = None
+		self._ticking = False
+
+	@property
+	def owner(self) -> Node:
+		return self._owner
+
+	@property
+	def scheduler(self) -> Scheduler:
+		scheduler = self._owner.scheduler
+		assert scheduler is not None, 'Update manager owner does not have a scheduler'
+		return scheduler
+
+	@property
+	def fixed_step(self) -> float | None:
+		"""
+		The step of the scheduler when it only advances in fixed steps.
+		When it is set, the nodes are ticked every `round(interval / fixed_step)` steps with `dt` as a multiple of the step,
+		so the update rate does not drift with the float clock.
+		"""
+		return self._fixed_step
+
+	@fixed_step.setter
+	def fixed_step(self, step: float | None):
+		assert step is None or (isinstance(step, (int, float)) and step > 0)
+		if step == self._fixed_step:
+			return
+		self._fixed_step = step
+		self._reschedule()
+
+	@property
+	def busy_time(self) -> float:
+		"""
+		How many seconds the `on_update` of its nodes took in total
+		"""
+		return self._busy / 1e9
+
+	def __len__(self) -> int:
+		return len(self._registered)
+
+	def __contains__(self, node: Node) -> bool:
+		return node in self._registered
+
+	def register(self, node: Node, interval: float,
+		phase: UpdatePhase = UpdatePhase.UPDATE, priority: int = 0):
+		assert isinstance(interval, (int, float)) and interval >= 0
+		assert isinstance(phase, UpdatePhase)
+		assert isinstance(priority, int)
+		if node in self._registered:
+			self.unregister(node)
+		group = self._groups.get(interval, None)
+		if group is None:
+			group = _UpdateGroup(self, interval, self.scheduler.time)
+			self._groups[interval] = group
+		group.add(node, phase, priority)
+		self._registered[node] = (interval, phase, priority)
+		if not self._ticking:
+			self._reschedule()
+
+	def unregister(self, node: Node) -> bool:
+		reg = self._registered.pop(node, None)
+		if reg is None:
+			return False
+		interval, phase, priority = reg
+		group = self._groups[interval]
+		group.remove(node, phase, priority)
+		if not self._ticking and len(group) == 0:
+			del self._groups[interval]
+			self._reschedule()
+		return True
+
+	def clear(self):
+		if self._task is not None:
+			self._task.cancel()
+			self._task = None
+		self._groups.clear()
+		self._registered.clear()
+
+	def _reschedule(self):
+		if len(self._groups) == 0:
+			if self._task is not None:
+				self._task.cancel()
+				self._task = None
+			return
+		scheduler = self.scheduler
+		if self._fixed_step is not None:
+			# every step counts
+			when = scheduler.time
+		else:
+			when = min(g._next for g in self._groups.values())
+		task = self._task
+		if task is None:
+			task = self._task = Task(when, self._tick)
+		elif task.scheduled and task.when == when:
+			return
+		task._when = when
+		scheduler.put_task(task)
+
+	def _tick(self):
+		now = self.scheduler.time
+		due: list[tuple[_UpdateBucket, float]] = []
+		for group in self._groups.values():
+			dt = group.due(now)
+			if dt is not None:
+				due.extend((bucket, dt) for bucket in group._order)
+		# the sort is stable, so buckets with the same phase and priority keep the order of their groups
+		due.sort(key=lambda d: d[0].sort_key())
+		self._ticking = True
+		start = perf_counter_ns()
+		try:
+			for bucket, dt in due:
+				for n in bucket.nodes:
+					if n is not None:
+						n.on_update(dt)
+		finally:
+			self._busy += perf_counter_ns() - start
+			self._ticking = False
+			for interval, group in list(self._groups.items()):
+				group._drop_empty()
+				if len(group) == 0:
+					del self._groups[interval]
+			self._reschedule()
@@ -0,0 +1,180 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from .resources import Color, Colors, Vec2
+from .camera import Camera
+from .nodes import Scene
+from .renderer import Renderer
+
+import pygame
+
+if TYPE_CHECKING:
+	import numpy
+
+__all__ = [
+	'OffscreenRenderer',
+	'ImageDiff',
+	'surface_pixels',
+	'diff_images',
+]
+
+class OffscreenRenderer:
+	"""
+	Renders scenes into its own surface, so it works without a display.
+	The target and the renderer are reused between frames, so rendering many frames in a row stays cheap.
+	"""
+
+	def __init__(self, size: Vec2 | tuple[int, int], *, clear_color: Color = Colors.white,
+		renderer: Renderer | None = None):
+		if isinstance(size, Vec2):
+			size = (int(size.x), int(size.y))
+		assert size[0] > 0 and size[1] > 0
+		self._target = pygame.Surface(size, pygame.SRCALPHA)
+		self._renderer = Renderer() if renderer is None else renderer
+		self._clear_color = clear_color
+		self._camera = Camera(0, 0)
+
+	@property
+	def size(self) -> tuple[int, int]:
+		return self._target.get_size()
+
+	@property
+	def target(self) -> pygame.Surface:
+		return self._target
+
+	@property
+	def renderer(self) -> Renderer:
+		return self._renderer
+
+	@property
+	def camera(self) -> Camera:
+		return self._camera
+
+	@camera.setter
+	def camera(self, camera: Camera):
+		self._camera = camera
+
+	@property
+	def clear_color(self) -> Color:
+		return self._clear_color
+
+	@clear_color.setter
+	def clear_color(self, color: Color | tuple[int, int, int]):
+		if not isinstance(color, Color):
+			color = Color(*color)
+		self._clear_color = color
+
+	def render(self, scene: Scene) -> pygame.Surface:
+		"""
+		Draw `scene` onto the target and return it.
+		The arrays returned by `pixels` lock the target, drop them before rendering again.
+		"""
+		self._renderer.render(scene, self._target, self._camera, self._clear_color)
+		return self._target
+
+	def pixels(self, *, alpha: bool = False) -> numpy.ndarray:
+		"""
+		Return the target as a (width, height, 3) array, or its (width, height) alpha channel.
+		See `surface_pixels`.
+		"""
+		return surface_pixels(self._target, alpha=alpha)
+
+def surface_pixels(surface: pygame.Surface, *, alpha: bool = False) -> numpy.ndarray:
+	"""
+	Return a view of the pixels of `surface` without copying them, it is indexed by [x, y].
+	The surface stays locked while the view is alive.
+	Needs numpy.
+	"""
+	if alpha:
+		return pygame.surfarray.pixels_alpha(surface)
+	return pygame.surfarray.pixels3d(surface)
+
+class ImageDiff:
+	"""
+	The result of `diff_images`, a pixel differs when any of its channels is off by more than the tolerance
+	"""
+
+	def __init__(self, mask: numpy.ndarray, max_delta: int, tolerance: int):
+		self._mask = mask
+		self._count = int(mask.sum())
+		self._max_delta = max_delta
+		self._tolerance = tolerance
+
+	@property
+	def mask(self) -> numpy.ndarray:
+		"""
+		A (width, height) boolean array of the pixels which differ
+		"""
+		return self._mask
+
+	@property
+	def count(self) -> int:
+		return self._count
+
+	@property
+	def total(self) -> int:
+		return self._mask.size
+
+	@property
+	def ratio(self) -> float:
+		return self._count / self._mask.size if self._mask.size > 0 else 0.0
+
+	@property
+	def max_delta(self) -> int:
+		"""
+		The largest difference of a single channel, including the pixels within tolerance
+		"""
+		return self._max_delta
+
+	@property
+	def tolerance(self) -> int:
+		return self._tolerance
+
+	@property
+	def matches(self) -> bool:
+		return self._count == 0
+
+	def __bool__(self) -> bool:
+		return self.matches
+
+	def __repr__(self) -> str:
+		return f'<ImageDiff count={self._count}/{self.total} max_delta={self._max_delta} tolerance={self._tolerance}>'
+
+def diff_images(a: pygame.Surface | numpy.ndarray, b: pygame.Surface | numpy.ndarray, tolerance: int = 0, *,
+	alpha: bool = True) -> ImageDiff:
+	"""
+	Compare two images of the same size pixel by pixel.
+	The images are surfaces or arrays indexed by [x, y] with 3 or 4 channels, like the ones `surface_pixels` returns.
+	Set `alpha` to False to ignore the alpha channel.
+	Needs numpy.
+	"""
+	import numpy
+
+	assert isinstance(tolerance, int) and 0 <= tolerance <= 0xff
+	ca = _channels(a, alpha)
+	cb = _channels(b, alpha)
+	assert ca[0].shape[:2] == cb[0].shape[:2], 'Images have different sizes'
+	delta: numpy.ndarray | None = None
+	for x, y in zip(ca, cb):
+		# stay in uint8, subtracting the smaller one never underflows
+		d = numpy.maximum(x, y) - numpy.minimum(x, y)
+		if d.ndim == 3:
+			d = d.max(axis=2)
+		delta = d if delta is None else numpy.maximum(delta, d)
+	assert delta is not None
+	max_delta = int(delta.max()) if delta.size > 0 else 0
+	return ImageDiff(delta > tolerance, max_delta, tolerance)
+
+def _channels(image: pygame.Surface | numpy.ndarray, alpha: bool) -> list[numpy.ndarray]:
+	if isinstance(image, pygame.Surface):
+		channels = [surface_pixels(image)]
+		if alpha and image.get_flags() & pygame.SRCALPHA:
+			channels.append(surface_pixels(image, alpha=True))
+		return channels
+	assert image.ndim == 3 and image.shape[2] in (3, 4)
+	if image.shape[2] == 3 or not alpha:
+		return [image[:, :, :3]]
+	return [image[:, :, :3], image[:, :, 3]]
@@ -0,0 +1,154 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+from collections import deque
+import math
+import threading
+import time
+from time import perf_counter_ns
+
+__all__ = [
+	'get_sleep_granularity',
+	'JitterStats',
+	'FramePacer',
+]
+
+_sleep_granularity: int | None = None
+
+def get_sleep_granularity() -> int:
+	"""
+	Return how many nanoseconds `time.sleep` may overshoot on this platform.
+	It is measured once, the first time it is needed.
+	"""
+	global _sleep_granularity
+	if _sleep_granularity is None:
+		samples = []
+		for _ in range(11):
+			start = perf_counter_ns()
+			time.sleep(0.001)
+			samples.append(perf_counter_ns() - start - 1_000_000)
+		samples.sort()
+		_sleep_granularity = max(0, samples[len(samples) // 2])
+	return _sleep_granularity
+
+class JitterStats:
+	def __init__(self, window: int = 120):
+		assert isinstance(window, int) and window > 0
+		self._samples: deque[int] = deque(maxlen=window)
+		self._total = 0
+
+	def _add(self, late: int):
+		self._samples.append(late)
+		self._total += 1
+
+	@property
+	def window(self) -> int:
+		return self._samples.maxlen or 0
+
+	@property
+	def total(self) -> int:
+		return self._total
+
+	@property
+	def samples(self) -> list[float]:
+		return [s / 1e9 for s in self._samples]
+
+	@property
+	def mean(self) -> float:
+		if len(self._samples) == 0:
+			return 0.0
+		return sum(self._samples) / len(self._samples) / 1e9
+
+	@property
+	def max(self) -> float:
+		if len(self._samples) == 0:
+			return 0.0
+		return max(self._samples) / 1e9
+
+	@property
+	def stddev(self) -> float:
+		n = len(self._samples)
+		if n < 2:
+			return 0.0
+		mean = sum(self._samples) / n
+		return math.sqrt(sum((s - mean) ** 2 for s in self._samples) / (n - 1)) / 1e9
+
+	def clear(self):
+		self._samples.clear()
+		self._total = 0
+
+	def __repr__(self) -> str:
+		return f'<JitterStats mean={self.mean * 1e3:.3f}ms max={self.max * 1e3:.3f}ms stddev={self.stddev * 1e3:.3f}ms>'
+
+class FramePacer:
+	"""
+	Waits for deadlines on the monotonic clock,
+	sleeps for the coarse part of the wait and spins for the last `spin_budget` seconds.
+	"""
+
+	def __init__(self, spin_budget: float = 0.002, *, window: int = 120):
+		assert isinstance(spin_budget, (int, float)) and spin_budget >= 0
+		self._spin_budget = int(spin_budget * 1e9)
+		self._stats = JitterStats(window)
+		self._idle = 0
+
+	@property
+	def spin_budget(self) -> float:
+		return self._spin_budget / 1e9
+
+	@spin_budget.setter
+	def spin_budget(self, spin_budget: float):
+		assert isinstance(spin_budget, (int, float)) and spin_budget >= 0
+		self._spin_budget = int(spin_budget * 1e9)
+
+	@property
+	def stats(self) -> JitterStats:
+		return self._stats
+
+	@property
+	def idle_time(self) -> float:
+		"""
+		How many seconds it has spent waiting in total
+		"""
+		return self._idle / 1e9
+
+	@staticmethod
+	def now() -> int:
+		return perf_counter_ns()
+
+	def wait_until(self, deadline: int, wakeup: threading.Event | None = None) -> int:
+		"""
+		Block until `deadline` (in `perf_counter_ns` units) and return the time it woke up at.
+		Returns early once `wakeup` is set.
+		"""
+		margin = self._spin_budget
+		if margin > 0:
+			margin = max(margin, get_sleep_granularity())
+		start = perf_counter_ns()
+		if start >= deadline:
+			return start
+		remain = deadline - start - margin
+		if remain > 0 and self._sleep(remain, wakeup):
+			now = perf_counter_ns()
+			self._idle += now - start
+			return now
+		now = perf_counter_ns()
+		while now < deadline:
+			if wakeup is not None and wakeup.is_set():
+				break
+			now = perf_counter_ns()
+		else:
+			self._stats._add(now - deadline)
+		self._idle += now - start
+		return now
+
+	def _sleep(self, timeout: int, wakeup: threading.Event | None) -> bool:
+		"""
+		Sleep for about `timeout` nanoseconds, returns True if it was woken up early
+		"""
+		if wakeup is None:
+			time.sleep(timeout / 1e9)
+			return False
+		return wakeup.wait(timeout / 1e9)
+
+	def sleep(self, seconds: float) -> int:
+		return self.wait_until(perf_counter_ns() + int(seconds * 1e9))
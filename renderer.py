@@ -0,0 +1,636 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+from __future__ import annotations
+
+import concurrent.futures
+import math
+import queue
+import threading
+from typing import Callable
+
+from .resources import Color, SurfaceView, TransformCache
+from .camera import Camera
+from .nodes import Node, Scene, UILayer
+
+import pygame
+
+__all__ = [
+	'DrawList',
+	'Renderer',
+	'RenderThread',
+]
+
+_MAX_DAMAGE_RECTS = 32
+
+class DrawList:
+	"""
+	A snapshot of a frame made by `Renderer.prepare`, it does not change after it is made
+	"""
+
+	__slots__ = ('_frame', '_target', '_nodes', '_commands', '_damage', '_clear_color')
+
+	def __init__(self, frame: int, target: pygame.Surface, nodes: tuple[Node, ...], commands: tuple[tuple, ...],
+		damage: tuple[pygame.Rect, ...] | None, clear_color: tuple[int, int, int, int]):
+		self._frame = frame
+		self._target = target
+		self._nodes = nodes
+		self._commands = commands
+		self._damage = damage
+		self._clear_color = clear_color
+
+	@property
+	def target(self) -> pygame.Surface:
+		return self._target
+
+	@property
+	def commands(self) -> tuple[tuple, ...]:
+		return self._commands
+
+	@property
+	def damage(self) -> tuple[pygame.Rect, ...] | None:
+		"""
+		The areas which will be redrawn, or None if the whole target will be
+		"""
+		return self._damage
+
+	@property
+	def clear_color(self) -> tuple[int, int, int, int]:
+		return self._clear_color
+
+	def __len__(self) -> int:
+		return len(self._commands)
+
+class Renderer:
+	"""
+	Draws a scene from its retained display list,
+	the list is only rebuilt for the subtrees whose structure, z index or visibility changed.
+	"""
+
+	def __init__(self):
+		self._dirty_rendering = False
+		self._dirty_threshold = 0.5
+		self._drawn: dict[Node, pygame.Rect] = {}
+		self._last_frame_key: tuple | None = None
+		self._culling = True
+		self._transform_cache = TransformCache()
+		self._drawn_count = 0
+		self._culled_count = 0
+		self._allocated_count = 0
+		self._bitmap_allocated = 0
+		# ids of the draw lists shared with a render thread, and of the last one it finished
+		self._shared_frame = 0
+		self._executed_frame = 0
+		self._workers = 0
+		self._tile_size = (256, 256)
+		self._pool: concurrent.futures.ThreadPoolExecutor | None = None
+		self._tiles: tuple[pygame.Surface, tuple[int, int], tuple[int, int], list[pygame.Surface]] | None = None
+
+	@property
+	def dirty_rendering(self) -> bool:
+		"""
+		Only redraw the areas of the target which changed since the last frame.
+		Nodes which draw differently without changing their position, size or visibility must call `invalidate`.
+		"""
+		return self._dirty_rendering
+
+	@dirty_rendering.setter
+	def dirty_rendering(self, dirty_rendering: bool):
+		assert isinstance(dirty_rendering, bool)
+		self._dirty_rendering = dirty_rendering
+		self._last_frame_key = None
+
+	@property
+	def dirty_threshold(self) -> float:
+		"""
+		The part of the target which has to be damaged before a frame is fully redrawn
+		"""
+		return self._dirty_threshold
+
+	@dirty_threshold.setter
+	def dirty_threshold(self, threshold: float):
+		assert isinstance(threshold, (int, float)) and 0 <= threshold <= 1
+		self._dirty_threshold = threshold
+
+	@property
+	def culling(self) -> bool:
+		"""
+		Skip the world nodes outside of the camera viewport,
+		a whole subtree is skipped at once when its bounds are outside.
+		"""
+		return self._culling
+
+	@culling.setter
+	def culling(self, culling: bool):
+		assert isinstance(culling, bool)
+		self._culling = culling
+
+	@property
+	def transform_cache(self) -> TransformCache:
+		"""
+		The rotated and scaled variants of the render targets
+		"""
+		return self._transform_cache
+
+	@property
+	def drawn_count(self) -> int:
+		"""
+		How many nodes were drawn at the last frame
+		"""
+		return self._drawn_count
+
+	@property
+	def culled_count(self) -> int:
+		"""
+		How many nodes were skipped at the last frame because they were outside of the viewport
+		"""
+		return self._culled_count
+
+	@property
+	def allocated_count(self) -> int:
+		"""
+		How many surfaces were allocated at the last frame, for the render targets and their transformed variants
+		"""
+		return self._allocated_count
+
+	@property
+	def workers(self) -> int:
+		"""
+		How many threads rasterize a full redraw, the target is split into tiles which are drawn in parallel.
+		0 or 1 draws on the calling thread.
+		"""
+		return self._workers
+
+	@workers.setter
+	def workers(self, workers: int):
+		assert isinstance(workers, int) and workers >= 0
+		if workers == self._workers:
+			return
+		self.shutdown()
+		self._workers = workers
+
+	@property
+	def tile_size(self) -> tuple[int, int]:
+		return self._tile_size
+
+	@tile_size.setter
+	def tile_size(self, size: tuple[int, int]):
+		assert size[0] > 0 and size[1] > 0
+		self._tile_size = (int(size[0]), int(size[1]))
+		self._tiles = None
+
+	def reset(self):
+		"""
+		Forget the last frame, the next one is fully redrawn
+		"""
+		self._drawn = {}
+		self._last_frame_key = None
+		self._transform_cache.clear()
+		self._tiles = None
+
+	def shutdown(self, wait: bool = True):
+		"""
+		Shut down the tile workers, they are started again when needed
+		"""
+		pool = self._pool
+		if pool is not None:
+			self._pool = None
+			pool.shutdown(wait=wait)
+
+	def render(self, scene: Scene, target: pygame.Surface, camera: Camera, clear_color: Color) -> list[pygame.Rect] | None:
+		"""
+		Draw `scene` onto `target`.
+		Returns the areas which were redrawn, or None if the whole target was.
+		"""
+		return self.execute(self.prepare(scene, target, camera, clear_color))
+
+	def prepare(self, scene: Scene, target: pygame.Surface, camera: Camera, clear_color: Color, *,
+		shared: bool = False) -> DrawList:
+		"""
+		Collect what `render` would draw without drawing it yet.
+		With `shared` set the draw list may be executed on another thread,
+		so the render targets in it are copied on write and nodes drawing directly get a render target instead,
+		which is redrawn every frame.
+		"""
+		frame = 0
+		if shared:
+			self._shared_frame += 1
+			frame = self._shared_frame
+		nodes, commands = self._collect(scene, target, camera, frame) if scene.visible else ([], [])
+		frame_key = (id(scene), camera.x, camera.y, target.get_size(), clear_color.rgba)
+		full = not self._dirty_rendering or frame_key != self._last_frame_key
+		self._last_frame_key = frame_key
+		rgba = clear_color.rgba
+
+		damage: list[pygame.Rect] | None = None
+		if not full:
+			damage = self._collect_damage(nodes, commands)
+			if len(damage) == 0:
+				return DrawList(frame, target, (), (), (), rgba)
+			screen = target.get_rect()
+			area = sum(r.w * r.h for r in damage)
+			if area > screen.w * screen.h * self._dirty_threshold:
+				damage = None
+
+		if self._dirty_rendering:
+			drawn: dict[Node, pygame.Rect] = {}
+			for n, cmd in zip(nodes, commands):
+				n._dirty = False
+				drawn[n] = cmd[1]
+			self._drawn = drawn
+
+		return DrawList(frame, target, tuple(nodes), tuple(commands), None if damage is None else tuple(damage), rgba)
+
+	def execute(self, draw_list: DrawList) -> list[pygame.Rect] | None:
+		"""
+		Draw a draw list made by `prepare`, returns the same as `render`
+		"""
+		target = draw_list._target
+		nodes = draw_list._nodes
+		commands = draw_list._commands
+		rgba = draw_list._clear_color
+		damage = draw_list._damage
+		if damage is None:
+			if self._workers <= 1 or not self._execute_tiles(target, commands, rgba):
+				target.fill(rgba)
+				self._execute(target, nodes, commands)
+		else:
+			for r in damage:
+				target.set_clip(r)
+				target.fill(rgba, r)
+				self._execute(target, nodes, commands, r)
+			target.set_clip(None)
+		if draw_list._frame > 0:
+			# the render targets of this frame may be drawn over again
+			self._executed_frame = draw_list._frame
+		return None if damage is None else list(damage)
+
+	def _collect(self, scene: Scene, target: pygame.Surface, camera: Camera, shared: int = 0) -> tuple[list[Node], list[tuple]]:
+		"""
+		Turn the display list into blit commands for `Surface.blits`,
+		the command of a node drawing directly has no surface.
+		`shared` is the id of the draw list when it is shared with a render thread.
+		"""
+		executed = self._executed_frame
+		display = scene._get_display_nodes()
+		ui_start = scene._ui_start
+		screen = target.get_rect()
+		screen_size = target.get_size()
+		cdx = camera.x - screen_size[0] // 2
+		cdy = camera.y - screen_size[1] // 2
+		viewport = pygame.Rect((cdx, cdy), screen_size)
+		culling = self._culling
+		culled = 0
+		base_draw = Node.on_draw
+		misses = self._transform_cache.misses
+		self._bitmap_allocated = 0
+		allocated = 0
+		nodes: list[Node] = []
+		commands: list[tuple] = []
+		i = 0
+		count = len(display)
+		while i < count:
+			n = display[i]
+			if culling and 0 < i < ui_start and not viewport.colliderect(n._get_bounds()):
+				# the subtree of a node follows it in the display list
+				skip = len(n._get_display_nodes())
+				culled += skip
+				i += skip
+				continue
+			if n._cache_as_bitmap and i > 0:
+				# the whole subtree is drawn by a single blit of its bitmap
+				skip = len(n._get_display_nodes())
+				in_world = i < ui_start
+				i += skip
+				bitmap, rect = self._get_bitmap(n, executed)
+				if bitmap is None:
+					continue
+				if in_world:
+					rect = rect.move(-cdx, -cdy)
+				if culling and not screen.colliderect(rect):
+					culled += skip
+					continue
+				nodes.append(n)
+				commands.append((bitmap, rect) if n._blend_flags == 0 else (bitmap, rect, None, n._blend_flags))
+				continue
+			i += 1
+			if type(n).on_draw is base_draw:
+				# nothing to draw, do not even allocate a render target
+				continue
+			if i == 1 or (i > ui_start and isinstance(n, UILayer)):
+				# the scene and the ui layers cover the whole screen
+				nodes.append(n)
+				surface = n._render_target
+				if surface is None or n._content_dirty or n._render_size != screen_size:
+					if n._render_shared > executed:
+						# copy on write, a render thread may still be drawing the old target
+						n._render_target = None
+					old = surface
+					surface = n._get_render_target(screen_size)
+					if surface is not old:
+						allocated += 1
+				if shared:
+					n._render_shared = shared
+				commands.append((surface.native, screen) if n._blend_flags == 0 else (surface.native, screen, None, n._blend_flags))
+				continue
+			rect = n._world_rect or n._get_world_rect()
+			if i <= ui_start:
+				rect = rect.move(-cdx, -cdy)
+			if culling and not screen.colliderect(rect):
+				culled += 1
+				continue
+			nodes.append(n)
+			if n._draw_direct:
+				if not shared:
+					commands.append((None, rect))
+					continue
+				# it would be drawn again every frame if it drew directly, so redraw its render target as well
+				n._content_dirty = True
+			a, b, c, d, _, _ = n._world
+			transformed = a != 1 or b != 0 or c != 0 or d != 1
+			surface = n._render_target
+			in_flight = n._render_shared > executed
+			# scaling and rotating reads the target too, which fails while a render thread is blitting it
+			if surface is None or n._content_dirty or (transformed and in_flight):
+				if in_flight:
+					n._render_target = None
+					n._render_shared = 0
+				old = surface
+				surface = n._get_render_target()
+				if surface is not old:
+					allocated += 1
+			native = surface.native
+			if transformed:
+				# only the transformed copy is shared with the render thread
+				native = self._transform(n, native, a, b, c, d)
+				rect = native.get_rect(center=rect.center)
+			elif shared:
+				n._render_shared = shared
+			if n._blend_flags == 0:
+				commands.append((native, rect))
+			else:
+				commands.append((native, rect, None, n._blend_flags))
+		self._drawn_count = len(nodes)
+		self._culled_count = culled
+		self._allocated_count = allocated + self._bitmap_allocated + self._transform_cache.misses - misses
+		return nodes, commands
+
+	def _get_bitmap(self, n: Node, executed: int) -> tuple[pygame.Surface | None, pygame.Rect]:
+		"""
+		Return the cached bitmap of the subtree of `n` and the rect it covers in the space of `n`'s parent layer,
+		the bitmap is drawn again if anything below `n` changed, or `n` was scaled or rotated.
+		"""
+		world = n._get_world()
+		bitmap = n._bitmap
+		last = n._bitmap_world
+		if n._bitmap_valid and last is not None and n._bitmap_rect is not None and last[:4] == world[:4]:
+			# moving the node does not change how its subtree looks
+			return bitmap, n._bitmap_rect.move(round(world[4] - last[4]), round(world[5] - last[5]))
+		bounds = n._get_bounds().copy()
+		n._bitmap_world = world
+		n._bitmap_rect = bounds
+		n._bitmap_valid = True
+		n._dirty = True
+		if not bounds:
+			n._bitmap = None
+			return None, bounds
+		ox, oy = bounds.topleft
+		display = n._get_display_nodes()
+		base_draw = Node.on_draw
+		nodes: list[Node] = []
+		commands: list[tuple] = []
+		i = 0
+		count = len(display)
+		while i < count:
+			m = display[i]
+			if i > 0 and m._cache_as_bitmap:
+				i += len(m._get_display_nodes())
+				surface, rect = self._get_bitmap(m, executed)
+				if surface is None:
+					continue
+				rect = rect.move(-ox, -oy)
+			else:
+				i += 1
+				if type(m).on_draw is base_draw:
+					continue
+				rect = (m._world_rect or m._get_world_rect()).move(-ox, -oy)
+				if m._draw_direct:
+					# the bitmap is drawn on the calling thread, so drawing directly is fine here
+					nodes.append(m)
+					commands.append((None, rect))
+					continue
+				target = m._render_target
+				in_flight = m._render_shared > executed
+				# drawing the target into the bitmap reads it as well
+				if target is None or m._content_dirty or in_flight:
+					if in_flight:
+						m._render_target = None
+						m._render_shared = 0
+					old = target
+					target = m._get_render_target()
+					if target is not old:
+						self._bitmap_allocated += 1
+				surface = target.native
+				a, b, c, d, _, _ = m._world
+				if a != 1 or b != 0 or c != 0 or d != 1:
+					surface = self._transform(m, surface, a, b, c, d)
+					rect = surface.get_rect(center=rect.center)
+			nodes.append(m)
+			commands.append((surface, rect) if m._blend_flags == 0 else (surface, rect, None, m._blend_flags))
+		# never draw over the old bitmap, a render thread may still be blitting it
+		bitmap = pygame.Surface(bounds.size, pygame.SRCALPHA)
+		self._bitmap_allocated += 1
+		self._execute(bitmap, tuple(nodes), tuple(commands))
+		n._bitmap = bitmap
+		return bitmap, bounds
+
+	def _collect_damage(self, nodes: list[Node], commands: list[tuple]) -> list[pygame.Rect]:
+		"""
+		Compare the commands with the last frame and return the merged areas which changed
+		"""
+		last = self._drawn.copy()
+		damage: list[pygame.Rect] = []
+		for n, cmd in zip(nodes, commands):
+			rect = cmd[1]
+			old = last.pop(n, None)
+			if old is None:
+				damage.append(rect)
+			elif n._dirty or old != rect:
+				damage.append(old)
+				damage.append(rect)
+		# whatever is left was removed or hidden since the last frame
+		damage.extend(last.values())
+		return _merge_rects([r for r in damage if r.w > 0 and r.h > 0])
+
+	@staticmethod
+	def _execute(target: pygame.Surface, nodes: tuple[Node, ...], commands: tuple[tuple, ...], clip: pygame.Rect | None = None):
+		if clip is not None:
+			picked = [i for i, cmd in enumerate(commands) if cmd[1].colliderect(clip)]
+			nodes = [nodes[i] for i in picked]
+			commands = [commands[i] for i in picked]
+		# everything is submitted through a single `blits` call, only the direct drawing nodes split it
+		start = 0
+		for i, cmd in enumerate(commands):
+			if cmd[0] is not None:
+				continue
+			if i > start:
+				target.blits(commands[start:i], doreturn=False)
+			start = i + 1
+			rect = cmd[1]
+			old_clip = target.get_clip()
+			target.set_clip(rect.clip(old_clip))
+			nodes[i].on_draw(SurfaceView(target, rect.topleft, rect.size))
+			target.set_clip(old_clip)
+		if start == 0:
+			target.blits(commands, doreturn=False)
+		elif start < len(commands):
+			target.blits(commands[start:], doreturn=False)
+
+	def _execute_tiles(self, target: pygame.Surface, commands: tuple[tuple, ...], rgba: tuple[int, int, int, int]) -> bool:
+		"""
+		Bin the commands into the tiles they overlap and draw the tiles on the workers,
+		pygame releases the GIL while it blits and fills.
+		Returns False without drawing anything if a node draws directly.
+		"""
+		size = target.get_size()
+		tiles = self._tiles
+		if tiles is None or tiles[0] is not target or tiles[1] != size or tiles[2] != self._tile_size:
+			tiles = (target, size, self._tile_size, _split_tiles(target, self._tile_size))
+			self._tiles = tiles
+		tw, th = self._tile_size
+		cols = (size[0] + tw - 1) // tw
+		rows = (size[1] + th - 1) // th
+		subsurfaces = tiles[3]
+		bins: list[list[tuple]] = [[] for _ in subsurfaces]
+		for cmd in commands:
+			surface = cmd[0]
+			if surface is None:
+				return False
+			rect = cmd[1]
+			if rect.w <= 0 or rect.h <= 0:
+				continue
+			x0 = max(rect.x // tw, 0)
+			x1 = min((rect.right - 1) // tw, cols - 1)
+			y0 = max(rect.y // th, 0)
+			y1 = min((rect.bottom - 1) // th, rows - 1)
+			flags = cmd[3] if len(cmd) > 3 else 0
+			for ty in range(y0, y1 + 1):
+				row = ty * cols
+				oy = rect.y - ty * th
+				for tx in range(x0, x1 + 1):
+					pos = (rect.x - tx * tw, oy)
+					bins[row + tx].append((surface, pos) if flags == 0 else (surface, pos, None, flags))
+		pool = self._pool
+		if pool is None:
+			pool = concurrent.futures.ThreadPoolExecutor(self._workers, thread_name_prefix='render_worker')
+			self._pool = pool
+		futures = [pool.submit(_draw_tile, sub, rgba, cmds) for sub, cmds in zip(subsurfaces, bins)]
+		for f in futures:
+			f.result()
+		return True
+
+	def _transform(self, n: Node, surface: pygame.Surface, a: float, b: float, c: float, d: float) -> pygame.Surface:
+		"""
+		Scale and rotate the render target of `n` by the linear part of its world transform
+		"""
+		sx = math.hypot(a, b)
+		if sx == 0:
+			return pygame.Surface((0, 0), pygame.SRCALPHA)
+		angle = math.degrees(math.atan2(b, a))
+		# a negative determinant means the node is mirrored
+		sy = (a * d - b * c) / sx
+		return self._transform_cache.get(surface, angle, sx, sy, version=n._render_version)
+
+def _split_tiles(target: pygame.Surface, tile_size: tuple[int, int]) -> list[pygame.Surface]:
+	w, h = target.get_size()
+	tw, th = tile_size
+	return [target.subsurface(pygame.Rect(x, y, min(tw, w - x), min(th, h - y)))
+		for y in range(0, h, th) for x in range(0, w, tw)]
+
+def _draw_tile(tile: pygame.Surface, rgba: tuple[int, int, int, int], commands: list[tuple]):
+	tile.fill(rgba)
+	if len(commands) > 0:
+		tile.blits(commands, doreturn=False)
+
+def _merge_rects(rects: list[pygame.Rect]) -> list[pygame.Rect]:
+	merged: list[pygame.Rect] = []
+	for r in rects:
+		r = r.copy()
+		# keep merging until the rect does not touch any other
+		i = r.collidelist(merged)
+		while i >= 0:
+			r.union_ip(merged.pop(i))
+			i = r.collidelist(merged)
+		merged.append(r)
+	if len(merged) > _MAX_DAMAGE_RECTS:
+		return [merged[0].unionall(merged[1:])]
+	return merged
+
+class RenderThread:
+	"""
+	Executes draw lists on a dedicated thread, so the next frame is simulated while the last one is rasterized.
+	At most one frame is in flight, `submit` waits for the previous frame before it queues the next one.
+	"""
+
+	def __init__(self, renderer: Renderer, *, name: str = 'ag-render'):
+		self._renderer = renderer
+		self._name = name
+		self._queue: queue.Queue[tuple[DrawList, Callable | None] | None] = queue.Queue(maxsize=1)
+		self._thread: threading.Thread | None = None
+		self._error: BaseException | None = None
+
+	@property
+	def renderer(self) -> Renderer:
+		return self._renderer
+
+	@property
+	def running(self) -> bool:
+		return self._thread is not None
+
+	def start(self):
+		assert self._thread is None, 'Render thread is already running'
+		self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+		self._thread.start()
+
+	def submit(self, draw_list: DrawList, present: Callable[[list[pygame.Rect] | None], None] | None = None):
+		"""
+		Queue a draw list made by `Renderer.prepare` with `shared` set,
+		`present` is called on the render thread with the result of `Renderer.execute`.
+		"""
+		assert self._thread is not None, 'Render thread is not running'
+		self.wait()
+		self._queue.put((draw_list, present))
+
+	def wait(self):
+		"""
+		Block until the queued frame is drawn and presented, re-raises the error it failed with
+		"""
+		self._queue.join()
+		error = self._error
+		if error is not None:
+			self._error = None
+			raise error
+
+	def stop(self):
+		thread = self._thread
+		if thread is None:
+			return
+		self._thread = None
+		self._queue.join()
+		self._queue.put(None)
+		if thread is not threading.current_thread():
+			thread.join()
+
+	def _run(self):
+		while True:
+			item = self._queue.get()
+			try:
+				if item is None:
+					return
+				draw_list, present = item
+				updated = self._renderer.execute(draw_list)
+				if present is not None:
+					present(updated)
+			except BaseException as e:
+				self._error = e
+			finally:
+				self._queue.task_done()
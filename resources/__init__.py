@@ -21,3 +21,7 @@ __all__.extend(font.__all__)
 from .texture import *
 from . import texture
 __all__.extend(texture.__all__)
+
+from .transform import *
+from . import transform
+__all__.extend(transform.__all__)
@@ -13,6 +13,7 @@ import pygame
 __all__ = [
 	'Anchor',
 	'Surface',
+	'SurfaceView',
 ]
 
 class Anchor(enum.Enum):
@@ -63,6 +64,10 @@ class Surface:
 			self._size = size.copy()
 			self._obj = pygame.Surface(size.xy, flags=pygame.constants.SRCALPHA)
 
+	@property
+	def native(self) -> pygame.Surface:
+		return self._obj
+
 	@property
 	def size(self) -> Vec2:
 		return self._size
@@ -115,3 +120,49 @@ class Surface:
 
 	def set_at(self, pos: tuple[int, int], color: Color):
 		self._obj.set_at(pos, color.rgba)
+
+class SurfaceView(Surface):
+	"""
+	A window at `offset` of another surface, everything drawn on it is moved by the offset
+	"""
+
+	def __init__(self, target: pygame.Surface, offset: tuple[float, float], size: Vec2 | tuple[float, float]):
+		super().__init__(target)
+		self._size = Vec2(size)
+		self._offset = Vec2(offset)
+
+	@property
+	def offset(self) -> Vec2:
+		return self._offset
+
+	def fill(self, color: Color, dest: Rect | None = None):
+		if dest is None:
+			dest = Rect(0, 0, self.size)
+		ox, oy = self._offset
+		super().fill(color, Rect(dest.x + ox, dest.y + oy, dest.w, dest.h))
+
+	def circle(self, color: Color, center: tuple[float, float], *args, **kwargs):
+		ox, oy = self._offset
+		x, y = center
+		super().circle(color, (x + ox, y + oy), *args, **kwargs)
+
+	def polygon(self, color: Color, points: Iterable[Vec2], width: int = 0):
+		ox, oy = self._offset
+		super().polygon(color,
+			[Vec2(p.x + ox, p.y + oy) for p in points],
+			width=width)
+
+	def blit(self, src: Surface | pygame.Surface, dest: Vec2 | tuple[float, float], anchor: Anchor = Anchor.CENTER):
+		if isinstance(dest, tuple):
+			dest = Vec2(dest)
+		super().blit(src, dest + self._offset, anchor=anchor)
+
+	def get_at(self, pos: tuple[int, int]) -> Color:
+		ox, oy = self._offset
+		x, y = pos
+		return super().get_at((int(x + ox), int(y + oy)))
+
+	def set_at(self, pos: tuple[int, int], color: Color):
+		ox, oy = self._offset
+		x, y = pos
+		super().set_at((int(x + ox), int(y + oy)), color)
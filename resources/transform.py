@@ -0,0 +1,142 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import weakref
+
+import pygame
+
+__all__ = [
+	'TransformCache',
+]
+
+class TransformCache:
+	"""
+	Keeps the rotated and scaled variants of surfaces,
+	angles and scales are quantized so a spinning or pulsing surface reuses its variants.
+	The least recently used variants are dropped once they take more than `budget` bytes.
+	"""
+
+	def __init__(self, budget: int = 64 * 1024 * 1024, *, angle_step: float = 1.0, scale_step: float = 1 / 64):
+		assert isinstance(budget, int) and budget >= 0
+		assert angle_step > 0 and scale_step > 0
+		self._budget = budget
+		self._angle_step = angle_step
+		self._scale_step = scale_step
+		self._entries: OrderedDict[tuple, tuple[pygame.Surface, int]] = OrderedDict()
+		# id of the source surface -> (weak reference, version, keys of its variants)
+		self._sources: dict[int, tuple[weakref.ref, int, set[tuple]]] = {}
+		self._size = 0
+		self._hits = 0
+		self._misses = 0
+
+	@property
+	def budget(self) -> int:
+		return self._budget
+
+	@budget.setter
+	def budget(self, budget: int):
+		assert isinstance(budget, int) and budget >= 0
+		self._budget = budget
+		self._evict()
+
+	@property
+	def angle_step(self) -> float:
+		return self._angle_step
+
+	@property
+	def scale_step(self) -> float:
+		return self._scale_step
+
+	@property
+	def size(self) -> int:
+		"""
+		How many bytes the cached variants take
+		"""
+		return self._size
+
+	@property
+	def hits(self) -> int:
+		return self._hits
+
+	@property
+	def misses(self) -> int:
+		return self._misses
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def clear(self):
+		self._entries.clear()
+		self._sources.clear()
+		self._size = 0
+
+	def get(self, surface: pygame.Surface, angle: float, scale_x: float, scale_y: float | None = None, *,
+		version: int = 0) -> pygame.Surface:
+		"""
+		Return `surface` scaled and then rotated clockwise by `angle` degrees,
+		a negative `scale_y` flips it vertically.
+		Bump `version` whenever the content of `surface` changed, so the old variants are dropped.
+		"""
+		if scale_y is None:
+			scale_y = scale_x
+		qa = round(angle / self._angle_step) % round(360 / self._angle_step)
+		qx = round(scale_x / self._scale_step)
+		qy = round(scale_y / self._scale_step)
+		if qx == 0 or qy == 0:
+			return pygame.Surface((0, 0), pygame.SRCALPHA)
+		sid = id(surface)
+		source = self._sources.get(sid, None)
+		if source is not None and (source[0]() is not surface or source[1] != version):
+			self._drop_source(sid)
+			source = None
+		key = (sid, qa, qx, qy)
+		entry = self._entries.get(key, None)
+		if entry is not None:
+			self._hits += 1
+			self._entries.move_to_end(key)
+			return entry[0]
+		self._misses += 1
+		variant = _transform(surface, qa * self._angle_step, qx * self._scale_step, qy * self._scale_step)
+		if source is None:
+			ref = weakref.ref(surface, lambda _, sid=sid: self._drop_source(sid))
+			source = (ref, version, set())
+			self._sources[sid] = source
+		source[2].add(key)
+		nbytes = variant.get_width() * variant.get_height() * variant.get_bytesize()
+		self._entries[key] = (variant, nbytes)
+		self._size += nbytes
+		self._evict()
+		return variant
+
+	def _drop_source(self, sid: int):
+		source = self._sources.pop(sid, None)
+		if source is None:
+			return
+		for key in source[2]:
+			entry = self._entries.pop(key, None)
+			if entry is not None:
+				self._size -= entry[1]
+
+	def _evict(self):
+		entries = self._entries
+		# the newest variant is kept even if it is larger than the budget
+		while self._size > self._budget and len(entries) > 1:
+			key, (_, nbytes) = entries.popitem(last=False)
+			self._size -= nbytes
+			source = self._sources.get(key[0], None)
+			if source is not None:
+				source[2].discard(key)
+
+def _transform(surface: pygame.Surface, angle: float, scale_x: float, scale_y: float) -> pygame.Surface:
+	if scale_y < 0:
+		surface = pygame.transform.flip(surface, False, True)
+		scale_y = -scale_y
+	if scale_x == scale_y:
+		return pygame.transform.rotozoom(surface, -angle, scale_x)
+	w, h = surface.get_size()
+	surface = pygame.transform.smoothscale(surface, (max(0, round(w * scale_x)), max(0, round(h * scale_y))))
+	if angle == 0:
+		return surface
+	return pygame.transform.rotate(surface, -angle)
@@ -1,13 +1,30 @@
 # Copyright (C) 2023 zyxkad@gmail.com
 
-import time
-from threading import RLock, Thread
-from typing import TypeVar
+from __future__ import annotations
+
+import abc
+from abc import abstractmethod
+import asyncio
+from collections import deque
+import concurrent.futures
+import enum
+import functools
+import math
+from heapq import heappush, heappop, heapify
+import inspect
+import threading
+from threading import get_ident
+from typing import Callable, TypeVar, Generator, Coroutine
+from .event import Event, EventTarget
+from .pacer import FramePacer
 from .utils import *
 
 __all__ = [
 	'StopSchedule',
-	'Task', 'IntervalTask',
+	'Task', 'IntervalPolicy', 'IntervalTask', 'CoroutineTask', 'ExecutorFuture',
+	'Wait', 'WaitFrames', 'WaitEvent',
+	'wait', 'wait_frames', 'wait_event',
+	'JobQueue', 'HeapQueue', 'TimingWheel',
 	'Scheduler'
 ]
 
@@ -24,6 +41,8 @@ class Task:
 		self._when = when
 		self._cb = cb
 		self._canceled = False
+		self._entry: list | None = None
+		self._scheduler: Scheduler | None = None
 
 	@property
 	def when(self) -> float:
@@ -37,12 +56,22 @@ class Task:
 	def canceled(self) -> bool:
 		return self._canceled
 
+	@property
+	def scheduled(self) -> bool:
+		return self._entry is not None
+
 	def cancel(self):
+		if self._canceled:
+			return
 		self._canceled = True
+		if self._scheduler is not None:
+			self._scheduler._discard(self)
 
 	def _call(self, scheduler: SchedulerSelf):
 		if not self.canceled:
-			self._cb()
+			r = self._cb()
+			if r is not None and inspect.isawaitable(r):
+				scheduler._spawn(r)
 
 	def __eq__(self, other):
 		return self.when == other.when
@@ -53,13 +82,31 @@ class Task:
 	def __gt__(self, other):
 		return self.when > other.when
 
+class IntervalPolicy(enum.Enum):
+	"""
+	What an `IntervalTask` does when it runs behind its schedule
+	"""
+	# reschedule at `now + interval`, every overrun shifts the following ticks (default)
+	DRIFT = enum.auto()
+	# keep the fixed rate, and run the missed ticks back-to-back, at most `max_catch_up` extra calls at once
+	CATCH_UP = enum.auto()
+	# keep the fixed rate, but drop the missed ticks
+	SKIP = enum.auto()
+
 class IntervalTask(Task):
-	def __init__(self, start: float, interval: float, cb):
+	def __init__(self, start: float, interval: float, cb, *,
+		policy: IntervalPolicy = IntervalPolicy.DRIFT, max_catch_up: int = 5):
 		super().__init__(start, cb)
 		assert isinstance(interval, (int, float))
 		assert interval >= 0
+		assert isinstance(policy, IntervalPolicy)
+		assert isinstance(max_catch_up, int) and max_catch_up >= 0
 		self._last: float = -1
 		self._interval = interval
+		self._policy = policy
+		self._max_catch_up = max_catch_up
+		self._missed = 0
+		self._late = 0
 
 	@property
 	def last(self) -> float:
@@ -69,57 +116,616 @@ class IntervalTask(Task):
 	def interval(self) -> float:
 		return self._interval
 
+	@property
+	def policy(self) -> IntervalPolicy:
+		return self._policy
+
+	@policy.setter
+	def policy(self, policy: IntervalPolicy):
+		assert isinstance(policy, IntervalPolicy)
+		self._policy = policy
+
+	@property
+	def max_catch_up(self) -> int:
+		return self._max_catch_up
+
+	@max_catch_up.setter
+	def max_catch_up(self, max_catch_up: int):
+		assert isinstance(max_catch_up, int) and max_catch_up >= 0
+		self._max_catch_up = max_catch_up
+
+	@property
+	def missed(self) -> int:
+		"""
+		How many ticks were dropped, by `SKIP` or beyond the `CATCH_UP` limit
+		"""
+		return self._missed
+
+	@property
+	def late(self) -> int:
+		"""
+		How many invocations ran at least one whole interval after they were due
+		"""
+		return self._late
+
+	def reset_counters(self):
+		self._missed = 0
+		self._late = 0
+
+	def _invoke(self, scheduler: SchedulerSelf, dt: float):
+		r = self._cb(dt)
+		if r is not None and inspect.isawaitable(r):
+			scheduler._spawn(r)
+
 	def _call(self, scheduler: SchedulerSelf):
 		if self.canceled:
 			return
 		now = scheduler.time
+		interval = self.interval
 		dt = now - self._last if self._last >= 0 else 0
 		self._last = now
+		late = now - self._when
+		if interval <= 0 or late < interval:
+			behind = 0
+		else:
+			self._late += 1
+			behind = int(late // interval)
+		extra = 0
+		if self._policy is IntervalPolicy.CATCH_UP and behind > 0:
+			extra = min(behind, self._max_catch_up)
+			# the replayed ticks carry an interval each, so the burst adds up to the elapsed time
+			dt = max(dt - extra * interval, 0)
 		try:
-			self._cb(dt)
+			self._invoke(scheduler, dt)
+			if self._policy is IntervalPolicy.CATCH_UP and behind > 0:
+				self._missed += behind - extra
+				for _ in range(extra):
+					if self.canceled:
+						break
+					self._invoke(scheduler, interval)
+			elif self._policy is IntervalPolicy.SKIP:
+				self._missed += behind
 		except StopSchedule:
-			pass
+			return
+		if self.canceled:
+			return
+		if self._policy is IntervalPolicy.DRIFT or interval <= 0:
+			self._when = now + interval
 		else:
-			self._when = now + self.interval
-			scheduler.put_task(self)
+			self._when += (behind + 1) * interval
+		scheduler.put_task(self)
+
+class Wait:
+	__slots__ = ('_seconds',)
+
+	def __init__(self, seconds: float):
+		assert isinstance(seconds, (int, float)) and seconds >= 0
+		self._seconds = seconds
+
+	@property
+	def seconds(self) -> float:
+		return self._seconds
+
+	def __await__(self):
+		return (yield self)
+
+class WaitFrames:
+	__slots__ = ('_frames',)
+
+	def __init__(self, frames: int = 1):
+		assert isinstance(frames, int) and frames >= 1
+		self._frames = frames
+
+	@property
+	def frames(self) -> int:
+		return self._frames
+
+	def __await__(self):
+		return (yield self)
+
+class WaitEvent:
+	__slots__ = ('_target', '_etype', '_capture')
+
+	def __init__(self, target: EventTarget, etype: str, *, capture: bool = False):
+		assert isinstance(target, EventTarget)
+		assert isinstance(etype, str)
+		self._target = target
+		self._etype = etype
+		self._capture = capture
+
+	@property
+	def target(self) -> EventTarget:
+		return self._target
+
+	@property
+	def etype(self) -> str:
+		return self._etype
+
+	@property
+	def capture(self) -> bool:
+		return self._capture
+
+	def __await__(self):
+		return (yield self)
+
+def wait(seconds: float) -> Wait:
+	return Wait(seconds)
+
+def wait_frames(frames: int = 1) -> WaitFrames:
+	return WaitFrames(frames)
+
+def wait_event(target: EventTarget, etype: str, *, capture: bool = False) -> WaitEvent:
+	return WaitEvent(target, etype, capture=capture)
+
+class ExecutorFuture:
+	"""
+	Result of `Scheduler.run_in_executor`.
+	The work runs on a pool, but done callbacks are always delivered on the scheduler thread.
+	"""
+
+	def __init__(self, scheduler: Scheduler, future: concurrent.futures.Future):
+		self._scheduler = scheduler
+		self._future = future
+		self._callbacks: list[Callable[[ExecutorFuture], None]] = []
+		self._delivered = False
+		future.add_done_callback(self.__on_done)
+
+	def __on_done(self, future: concurrent.futures.Future):
+		# called from the worker thread
+		self._scheduler._completions.append(self)
+		self._scheduler._notify()
+
+	def _deliver(self):
+		self._delivered = True
+		callbacks, self._callbacks = self._callbacks, []
+		for cb in callbacks:
+			cb(self)
+
+	@property
+	def future(self) -> concurrent.futures.Future:
+		return self._future
+
+	def done(self) -> bool:
+		"""
+		Whether the result has been delivered to the scheduler thread
+		"""
+		return self._delivered
 
-_sleep_offset = 0.0
-def _test_sleep_offset():
-	global _sleep_offset
-	x: float = 0
-	n: float = 0
-	s: float = 1
-	while True:
-		if n < 10:
-			s = 0.05
+	def cancelled(self) -> bool:
+		return self._future.cancelled()
+
+	def cancel(self) -> bool:
+		return self._future.cancel()
+
+	def result(self, timeout: float | None = None):
+		return self._future.result(timeout)
+
+	def exception(self, timeout: float | None = None) -> BaseException | None:
+		return self._future.exception(timeout)
+
+	def add_done_callback(self, cb: Callable[[ExecutorFuture], None]):
+		assert callable(cb)
+		if self._delivered:
+			cb(self)
+		else:
+			self._callbacks.append(cb)
+
+	def __await__(self):
+		return (yield self)
+
+class CoroutineTask(Task):
+	"""
+	Drives a generator or a coroutine which yields (or awaits) `wait`, `wait_frames`, `wait_event`
+	or an `ExecutorFuture`, whose result is sent back into the coroutine.
+	Yielding a number waits for that many seconds, yielding None waits for the next frame, see `Scheduler.frame`.
+	The same task record is reused for every step.
+	"""
+
+	def __init__(self, when: float, coro: Generator | Coroutine):
+		assert inspect.isgenerator(coro) or inspect.iscoroutine(coro)
+		super().__init__(when, coro.send)
+		self._coro = coro
+		self._value = None
+		self._throw: BaseException | None = None
+		self._frames = 0
+		self._running = False
+		self._done = False
+		self._result = None
+
+	@property
+	def done(self) -> bool:
+		return self._done
+
+	@property
+	def result(self):
+		assert self._done, 'Coroutine is not finished'
+		return self._result
+
+	def cancel(self):
+		if self._canceled:
+			return
+		super().cancel()
+		if not self._running and not self._done:
+			self._done = True
+			self._coro.close()
+
+	def _call(self, scheduler: SchedulerSelf):
+		if self.canceled:
+			return
+		if self._frames > 0:
+			self._frames -= 1
+			scheduler._frame_waiters.append(self)
+			return
+		value, self._value = self._value, None
+		throw, self._throw = self._throw, None
+		self._running = True
+		try:
+			if throw is not None:
+				cmd = self._coro.throw(throw)
+			else:
+				cmd = self._coro.send(value)
+		except (StopIteration, StopSchedule) as e:
+			self._done = True
+			self._result = getattr(e, 'value', None)
+			return
+		except BaseException:
+			self._done = True
+			raise
+		finally:
+			self._running = False
+		if self.canceled:
+			self._done = True
+			self._coro.close()
+			return
+		self._wait_for(scheduler, cmd)
+
+	def _resume(self, scheduler: SchedulerSelf, value):
+		if self.canceled:
+			return
+		self._value = value
+		self._when = scheduler.time
+		scheduler.put_task(self)
+
+	def _resume_future(self, scheduler: SchedulerSelf, future: ExecutorFuture):
+		if future.cancelled():
+			self._resume_throw(scheduler, concurrent.futures.CancelledError())
+			return
+		exc = future.exception()
+		if exc is not None:
+			self._resume_throw(scheduler, exc)
 		else:
-			s = 1
-		a = time.time()
-		time.sleep(s)
-		b = time.time() - a
-		if n > 1000000:
-			x = b
-			n = s
+			self._resume(scheduler, future.result())
+
+	def _resume_throw(self, scheduler: SchedulerSelf, exc: BaseException):
+		if self.canceled:
+			return
+		self._throw = exc
+		self._when = scheduler.time
+		scheduler.put_task(self)
+
+	def _wait_for(self, scheduler: SchedulerSelf, cmd):
+		if cmd is None:
+			scheduler._frame_waiters.append(self)
+		elif isinstance(cmd, (int, float)):
+			self._when = scheduler.time + cmd
+			scheduler.put_task(self)
+		elif isinstance(cmd, Wait):
+			self._when = scheduler.time + cmd.seconds
+			scheduler.put_task(self)
+		elif isinstance(cmd, WaitFrames):
+			self._frames = cmd.frames - 1
+			scheduler._frame_waiters.append(self)
+		elif isinstance(cmd, WaitEvent):
+			target = cmd.target
+			def listener(event: Event):
+				self._resume(scheduler, event)
+			target.register(cmd.etype, listener, once=True, capture=cmd.capture)
+		elif isinstance(cmd, ExecutorFuture):
+			cmd.add_done_callback(lambda f: self._resume_future(scheduler, f))
 		else:
-			x += b
-			n += s
-			_sleep_offset = 0.1 - x / n
-Thread(target=_test_sleep_offset, daemon=True, name='test_sleep_offset').start()
+			self._done = True
+			self._coro.close()
+			raise TypeError(f'Unexpected value yielded by coroutine task: {cmd!r}')
 
-class Scheduler:
+class JobQueue(abc.ABC):
+	"""
+	Storage backend of a `Scheduler`.
+	Entries are `[when, seq, task]` lists owned by the scheduler,
+	a discarded entry has its task set to None and must be skipped.
+	"""
+
+	@abstractmethod
+	def __len__(self) -> int:
+		raise NotImplementedError()
+
+	@abstractmethod
+	def push(self, entry: list) -> None:
+		raise NotImplementedError()
+
+	@abstractmethod
+	def discard(self, entry: list) -> None:
+		raise NotImplementedError()
+
+	@abstractmethod
+	def pop(self, now: float, limit: int) -> list | None:
+		"""
+		Pop the next entry which is due at `now` and whose seq is less than `limit`
+		"""
+		raise NotImplementedError()
+
+	@abstractmethod
+	def next_when(self) -> float | None:
+		"""
+		Return the earliest time at which an entry may become due, or None if the queue is empty
+		"""
+		raise NotImplementedError()
+
+	@abstractmethod
+	def clear(self) -> list[list]:
+		"""
+		Remove all entries and return the ones that were not discarded
+		"""
+		raise NotImplementedError()
+
+# Tombstoned entries are only swept out of the heap once they make up
+# more than half of it, so cancelling stays O(1) amortized
+_COMPACT_THRESHOLD = 64
+
+class HeapQueue(JobQueue):
 	def __init__(self):
+		self._jobs: list[list] = []
+		self._removed = 0
+
+	def __len__(self) -> int:
+		return len(self._jobs) - self._removed
+
+	def push(self, entry: list) -> None:
+		heappush(self._jobs, entry)
+
+	def discard(self, entry: list) -> None:
+		entry[2] = None
+		self._removed += 1
+		if self._removed > _COMPACT_THRESHOLD and self._removed * 2 > len(self._jobs):
+			self._jobs[:] = [e for e in self._jobs if e[2] is not None]
+			heapify(self._jobs)
+			self._removed = 0
+
+	def pop(self, now: float, limit: int) -> list | None:
+		jobs = self._jobs
+		while len(jobs) > 0:
+			entry = jobs[0]
+			if entry[0] > now or entry[1] >= limit:
+				return None
+			heappop(jobs)
+			if entry[2] is not None:
+				return entry
+			self._removed -= 1
+		return None
+
+	def next_when(self) -> float | None:
+		jobs = self._jobs
+		while len(jobs) > 0:
+			entry = jobs[0]
+			if entry[2] is not None:
+				return entry[0]
+			heappop(jobs)
+			self._removed -= 1
+		return None
+
+	def clear(self) -> list[list]:
+		entries = [e for e in self._jobs if e[2] is not None]
+		self._jobs.clear()
+		self._removed = 0
+		return entries
+
+def _entry_key(entry: list) -> tuple[float, int]:
+	return entry[0], entry[1]
+
+class TimingWheel(JobQueue):
+	"""
+	Hierarchical timing wheel, gives O(1) insert and cancel and amortized O(1) expiry.
+	Tasks are bucketed by `resolution` and may fire up to one resolution late, never early.
+	"""
+
+	def __init__(self, resolution: float = 0.001, *, slots: int = 256, levels: int = 4):
+		assert isinstance(resolution, (int, float)) and resolution > 0
+		assert slots > 1 and slots & (slots - 1) == 0, 'slots must be a power of 2'
+		assert levels >= 1
+		self._resolution = resolution
+		self._bits = slots.bit_length() - 1
+		self._mask = slots - 1
+		self._wheels: list[list[list[list]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+		self._span = 1 << (self._bits * levels)
+		# the last expired tick
+		self._tick = 0
+		self._ready: deque[list] = deque()
+		self._overflow: list[list] = []
+		# entries (including discarded ones) which are still inside the wheels
+		self._count = 0
+		self._size = 0
+
+	@property
+	def resolution(self) -> float:
+		return self._resolution
+
+	def __len__(self) -> int:
+		return self._size
+
+	def _tick_of(self, when: float) -> int:
+		return math.ceil(when / self._resolution)
+
+	def _place(self, entry: list, tick: int):
+		delta = tick - self._tick
+		if delta <= 0:
+			self._ready.append(entry)
+			return
+		if delta >= self._span:
+			heappush(self._overflow, entry)
+			return
+		bits = self._bits
+		level = 0
+		while delta >= 1 << (bits * (level + 1)):
+			level += 1
+		self._wheels[level][(tick >> (bits * level)) & self._mask].append(entry)
+		self._count += 1
+
+	def push(self, entry: list) -> None:
+		self._size += 1
+		self._place(entry, self._tick_of(entry[0]))
+
+	def discard(self, entry: list) -> None:
+		entry[2] = None
+		self._size -= 1
+
+	def _cascade(self, level: int, index: int):
+		slot = self._wheels[level][index]
+		if len(slot) == 0:
+			return
+		self._wheels[level][index] = []
+		self._count -= len(slot)
+		for entry in slot:
+			if entry[2] is not None:
+				self._place(entry, self._tick_of(entry[0]))
+
+	def _advance(self, target: int):
+		bits, mask = self._bits, self._mask
+		levels = len(self._wheels)
+		wheel0 = self._wheels[0]
+		overflow = self._overflow
+		while self._tick < target:
+			if self._count == 0:
+				if len(overflow) == 0:
+					self._tick = target
+					break
+				# nothing inside the wheels, skip ahead to where the overflow starts to matter
+				self._tick = max(self._tick, min(target, self._tick_of(overflow[0][0]) - self._span))
+				if self._tick >= target:
+					break
+			t = self._tick + 1
+			self._tick = t
+			while len(overflow) > 0 and self._tick_of(overflow[0][0]) - t < self._span:
+				entry = heappop(overflow)
+				if entry[2] is not None:
+					self._place(entry, self._tick_of(entry[0]))
+			if levels > 1 and (t & mask) == 0:
+				level = 1
+				while level < levels - 1 and ((t >> (bits * level)) & mask) == 0:
+					level += 1
+				for lv in range(level, 0, -1):
+					self._cascade(lv, (t >> (bits * lv)) & mask)
+			slot = wheel0[t & mask]
+			if len(slot) > 0:
+				wheel0[t & mask] = []
+				self._count -= len(slot)
+				if len(slot) > 1:
+					slot.sort(key=_entry_key)
+				self._ready.extend(slot)
+
+	def pop(self, now: float, limit: int) -> list | None:
+		target = math.floor(now / self._resolution)
+		if target > self._tick:
+			self._advance(target)
+		ready = self._ready
+		while len(ready) > 0:
+			entry = ready[0]
+			if entry[1] >= limit:
+				return None
+			ready.popleft()
+			if entry[2] is not None:
+				self._size -= 1
+				return entry
+		return None
+
+	def next_when(self) -> float | None:
+		if self._size == 0:
+			return None
+		for entry in self._ready:
+			if entry[2] is not None:
+				return entry[0]
+		t = self._tick
+		bits, mask = self._bits, self._mask
+		# entries above the first level cannot expire before the next cascade
+		boundary = ((t >> bits) + 1) << bits
+		wheel0 = self._wheels[0]
+		for tick in range(t + 1, boundary):
+			for entry in wheel0[tick & mask]:
+				if entry[2] is not None:
+					return tick * self._resolution
+		return boundary * self._resolution
+
+	def clear(self) -> list[list]:
+		entries = [e for e in self._ready if e[2] is not None]
+		for wheel in self._wheels:
+			for i, slot in enumerate(wheel):
+				if len(slot) > 0:
+					entries.extend(e for e in slot if e[2] is not None)
+					wheel[i] = []
+		entries.extend(e for e in self._overflow if e[2] is not None)
+		self._ready.clear()
+		self._overflow.clear()
+		self._count = 0
+		self._size = 0
+		return entries
+
+_IDLE_WAIT = 10_000_000 # ns
+
+class Scheduler:
+	def __init__(self, queue: JobQueue | None = None, *, pacer: FramePacer | None = None,
+		thread_workers: int | None = None, process_workers: int | None = None,
+		max_completions: int = 16, virtual: bool = False):
+		assert queue is None or isinstance(queue, JobQueue)
+		assert pacer is None or isinstance(pacer, FramePacer)
+		assert thread_workers is None or thread_workers > 0
+		assert process_workers is None or process_workers > 0
+		assert isinstance(max_completions, int) and max_completions > 0
 		self._time = 0.0
-		self._lock = RLock()
-		self._jobs = []
+		self._queue: JobQueue = HeapQueue() if queue is None else queue
+		self._pacer = FramePacer() if pacer is None else pacer
+		self._seq = 0
+		self._frame_waiters: list[Task] = []
 		self._paused = False
 		self._timescale = 1.0
+		self._virtual = virtual
 
 		self._looping = False
+		self._async_loop: asyncio.AbstractEventLoop | None = None
+		self._wakeup: asyncio.Future | None = None
+		self._async_tasks: set[asyncio.Task] = set()
+
+		# ident of the thread which runs the tasks, other threads post to the inbox instead
+		self._thread: int | None = None
+		self._inbox: deque[tuple[bool, Task]] = deque()
+		self._wake_event = threading.Event()
+
+		self._thread_workers = thread_workers
+		self._process_workers = process_workers
+		self._executors: dict[str, concurrent.futures.Executor] = {}
+		self._completions: deque[ExecutorFuture] = deque()
+		# futures submitted but not delivered yet, they keep the loop alive,
+		# the count of a scheduler includes the ones of its children
+		self._pending_futures = 0
+		self._max_completions = max_completions
+
+		# set on child schedulers, see `create_child`
+		self._parent: Scheduler | None = None
+		self._parent_task: Task | None = None
+		# rides on the frame waiters of the parent while the child has frame waiters of its own
+		self._parent_frame_task: Task | None = None
+		self._parent_frame_pending = False
+		self._base_time = 0.0
+		self._base_parent_time = 0.0
+		self._in_parent_tick = False
 
 	@property
 	def time(self) -> float:
+		if self._parent is not None:
+			self._sync_parent()
 		return self._time
 
+	@property
+	def parent(self) -> Scheduler | None:
+		return self._parent
+
 	@property
 	def paused(self) -> bool:
 		return self._paused
@@ -130,54 +736,348 @@ class Scheduler:
 
 	@timescale.setter
 	def timescale(self, timescale: float):
+		if self._parent is not None:
+			self._rebase_parent()
+			self._timescale = timescale
+			self._reschedule_parent()
+			return
 		self._timescale = timescale
+		self._notify()
+
+	@property
+	def virtual(self) -> bool:
+		"""
+		A virtual scheduler never waits for the wall clock, `loopUntilEmpty` jumps straight to the next task
+		"""
+		return self._virtual
+
+	@property
+	def queue(self) -> JobQueue:
+		return self._queue
+
+	@property
+	def pacer(self) -> FramePacer:
+		return self._pacer
+
+	def __len__(self) -> int:
+		return len(self._queue) + len(self._frame_waiters)
+
+	def _is_foreign_thread(self) -> bool:
+		return self._thread is not None and get_ident() != self._thread
 
 	def put_task(self, task: Task):
 		assert isinstance(task, Task)
-		with self._lock:
-			i = binSearch(self._jobs, lambda t: compare(t.when, task.when))
-			self._jobs.insert(i, task)
+		if self._is_foreign_thread():
+			self._inbox.append((True, task))
+			self._notify()
+			return task
+		if task._scheduler is not None:
+			task._scheduler._discard(task)
+		entry = [task.when, self._seq, task]
+		self._seq += 1
+		task._entry = entry
+		task._scheduler = self
+		self._queue.push(entry)
+		if self._parent is not None:
+			if not self._in_parent_tick:
+				self._reschedule_parent()
+		else:
+			self._notify()
 		return task
 
-	def add_interval(self, cb, interval: float):
+	def create_child(self, queue: JobQueue | None = None) -> Scheduler:
+		"""
+		Create a scheduler whose clock follows this one with its own `timescale` and `pause`.
+		The child only holds a single entry for its earliest task in this scheduler,
+		so pausing it or changing its timescale does not touch any of its tasks.
+		"""
+		child = Scheduler(queue, pacer=self._pacer, max_completions=self._max_completions, virtual=self._virtual)
+		child._parent = self
+		child._parent_task = Task(0, child._parent_tick)
+		child._parent_frame_task = Task(0, child._parent_frame)
+		child._base_parent_time = self.time
+		return child
+
+	def detach(self):
+		"""
+		Stop following the parent scheduler, the child keeps its tasks and its current time
+		"""
+		if self._parent is None:
+			return
+		self._sync_parent()
+		task = self._parent_task
+		assert task is not None
+		self._parent._discard(task)
+		self._parent._add_pending(-self._pending_futures)
+		self._parent = None
+		self._parent_task = None
+		self._parent_frame_task = None
+		self._parent_frame_pending = False
+
+	def _sync_parent(self):
+		parent = self._parent
+		assert parent is not None
+		if self._paused:
+			return
+		now = self._base_time + (parent.time - self._base_parent_time) * self._timescale
+		if now > self._time:
+			self._time = now
+
+	def _rebase_parent(self):
+		parent = self._parent
+		assert parent is not None
+		self._sync_parent()
+		self._base_time = self._time
+		self._base_parent_time = parent.time
+
+	def _parent_tick(self):
+		parent = self._parent
+		if parent is None:
+			return
+		self._in_parent_tick = True
+		try:
+			if self._paused:
+				self._advance_to(self._time)
+			else:
+				self._advance_to(self._base_time + (parent.time - self._base_parent_time) * self._timescale)
+		finally:
+			self._in_parent_tick = False
+		self._reschedule_parent()
+
+	def _parent_frame(self):
+		self._parent_frame_pending = False
+		parent = self._parent
+		if parent is None:
+			return
+		self._in_parent_tick = True
+		try:
+			if not self._paused:
+				self._sync_parent()
+				self._run_frame()
+		finally:
+			self._in_parent_tick = False
+		self._reschedule_parent()
+
+	def _reschedule_parent(self):
+		parent = self._parent
+		task = self._parent_task
+		if parent is None or task is None:
+			return
+		if len(self._inbox) > 0:
+			# the inbox is drained even while paused
+			when = parent.time
+		elif self._paused or self._timescale <= 0:
+			parent._discard(task)
+			return
+		elif len(self._completions) > 0:
+			# run at the next tick of the parent
+			when = parent.time
+		else:
+			frame_task = self._parent_frame_task
+			if len(self._frame_waiters) > 0 and frame_task is not None and not self._parent_frame_pending:
+				# wait for the next frame of the parent, putting the task at `parent.time` would tick it forever
+				# without moving the clock when the child always has a frame waiter
+				self._parent_frame_pending = True
+				parent._frame_waiters.append(frame_task)
+			next_when = self._queue.next_when()
+			if next_when is None:
+				parent._discard(task)
+				return
+			when = self._base_parent_time + (next_when - self._base_time) / self._timescale
+		if task._scheduler is parent and task._when == when:
+			return
+		task._when = when
+		parent.put_task(task)
+
+	@property
+	def max_completions(self) -> int:
+		"""
+		How many executor completions are delivered per tick at most
+		"""
+		return self._max_completions
+
+	@max_completions.setter
+	def max_completions(self, max_completions: int):
+		assert isinstance(max_completions, int) and max_completions > 0
+		self._max_completions = max_completions
+
+	def _get_executor(self, pool: str) -> concurrent.futures.Executor:
+		if self._parent is not None:
+			# children share the pools of the root scheduler
+			return self._parent._get_executor(pool)
+		executor = self._executors.get(pool, None)
+		if executor is None:
+			if pool == 'thread':
+				executor = concurrent.futures.ThreadPoolExecutor(self._thread_workers,
+					thread_name_prefix='scheduler_worker')
+			elif pool == 'process':
+				executor = concurrent.futures.ProcessPoolExecutor(self._process_workers)
+			else:
+				raise ValueError(f'Unknown executor pool {pool!r}')
+			self._executors[pool] = executor
+		return executor
+
+	def run_in_executor(self, fn, *args, pool: str = 'thread') -> ExecutorFuture:
+		"""
+		Run `fn(*args)` on a thread or process pool,
+		the returned future delivers its callbacks on the scheduler thread at a following tick.
+		"""
+		assert callable(fn)
+		future = ExecutorFuture(self, self._get_executor(pool).submit(fn, *args))
+		self._add_pending(1)
+		return future
+
+	def _add_pending(self, n: int):
+		scheduler = self
+		# only the root is looping, so it has to know about the futures of its children
+		while scheduler is not None:
+			scheduler._pending_futures += n
+			scheduler = scheduler._parent
+
+	def shutdown(self, wait: bool = True):
+		"""
+		Shut down the executor pools created by `run_in_executor`
+		"""
+		executors = list(self._executors.values())
+		self._executors.clear()
+		for executor in executors:
+			executor.shutdown(wait=wait, cancel_futures=True)
+
+	def call_soon_threadsafe(self, cb, *args) -> Task:
+		"""
+		Run `cb(*args)` on the scheduler thread at the start of the next tick,
+		it is safe to be called from any thread.
+		"""
+		assert callable(cb)
+		task = Task(0, functools.partial(cb, *args) if len(args) > 0 else cb)
+		self._inbox.append((True, task))
+		self._notify()
+		return task
+
+	def add_interval(self, cb, interval: float, *,
+		policy: IntervalPolicy = IntervalPolicy.DRIFT, max_catch_up: int = 5):
 		assert callable(cb)
 		assert isinstance(interval, (int, float))
-		task = IntervalTask(self._time + interval, interval, cb)
+		task = IntervalTask(self.time + interval, interval, cb,
+			policy=policy, max_catch_up=max_catch_up)
 		return self.put_task(task)
 
 	def add_timeout(self, cb, timeout: float):
 		assert callable(cb)
 		assert isinstance(timeout, (int, float))
-		task = Task(self._time + timeout, cb)
+		task = Task(self.time + timeout, cb)
 		return self.put_task(task)
 
+	def add_coroutine(self, coro: Generator | Coroutine) -> CoroutineTask:
+		task = CoroutineTask(self.time, coro)
+		return self.put_task(task)
+
+	def _discard(self, task: Task):
+		if self._is_foreign_thread():
+			self._inbox.append((False, task))
+			self._notify()
+			return
+		entry = task._entry
+		if entry is None or task._scheduler is not self:
+			return
+		task._entry = None
+		task._scheduler = None
+		self._queue.discard(entry)
+
+	def _drain_inbox(self):
+		inbox = self._inbox
+		while len(inbox) > 0:
+			put, task = inbox.popleft()
+			if not put:
+				self._discard(task)
+			elif not task.canceled:
+				self.put_task(task)
+
 	def unschedule(self, task: Task):
 		assert isinstance(task, Task)
-		with self._lock:
-			self._jobs.remove(task)
+		if task._scheduler is not self:
+			raise ValueError('Task is not scheduled by this scheduler')
+		self._discard(task)
 
 	def clear(self):
-		with self._lock:
-			self._jobs.clear()
+		self._inbox.clear()
+		self._frame_waiters.clear()
+		for entry in self._queue.clear():
+			task = entry[2]
+			task._entry = None
+			task._scheduler = None
 
 	def update(self, dt: float, *, check_looping: bool = False):
+		assert self._parent is None, 'Child schedulers are updated by their parent'
+		self._advance_to(self._time + dt * self.timescale, check_looping=check_looping)
+
+	def _advance_to(self, now: float, *, check_looping: bool = False):
+		self._thread = get_ident()
+		if len(self._inbox) > 0:
+			self._drain_inbox()
 		if self._paused:
 			return
 
-		self._time += dt * self.timescale
-		with self._lock:
-			for t in self._jobs.copy():
-				if check_looping and not self._looping:
-					return
-				if t.when > self._time:
-					break
-				self._jobs.pop(0)
-				t._call(self)
+		if now > self._time:
+			self._time = now
+		now = self._time
+		if len(self._completions) > 0:
+			completions = self._completions
+			for _ in range(min(len(completions), self._max_completions)):
+				self._add_pending(-1)
+				completions.popleft()._deliver()
+		# tasks put while updating are deferred to the next tick
+		limit = self._seq
+		pop = self._queue.pop
+		while True:
+			if check_looping and not self._looping:
+				return
+			entry = pop(now, limit)
+			if entry is None:
+				break
+			task = entry[2]
+			task._entry = None
+			task._scheduler = None
+			task._call(self)
+
+	def frame(self):
+		"""
+		Mark a frame boundary and resume the tasks waiting for a frame, `Director` calls it once per frame.
+		Tasks which wait for another frame while resuming wait for the next call.
+		"""
+		assert self._parent is None, 'Child schedulers get their frames from their parent'
+		self._thread = get_ident()
+		if len(self._inbox) > 0:
+			self._drain_inbox()
+		if not self._paused:
+			self._run_frame()
+
+	def _run_frame(self):
+		if len(self._frame_waiters) == 0:
+			return
+		waiters = self._frame_waiters
+		self._frame_waiters = []
+		for task in waiters:
+			task._call(self)
 
 	def run(self):
+		if self._parent is not None:
+			if self._paused:
+				self._paused = False
+				self._base_time = self._time
+				self._base_parent_time = self._parent.time
+				self._reschedule_parent()
+			return
 		self._paused = False
+		self._notify()
 
 	def pause(self):
+		if self._parent is not None:
+			if not self._paused:
+				self._sync_parent()
+				self._paused = True
+				self._reschedule_parent()
+			return
 		self._paused = True
 
 	@property
@@ -186,16 +1086,189 @@ class Scheduler:
 
 	def stop(self):
 		self._looping = False
+		self._notify()
+
+	def step(self, n: int = 1) -> int:
+		"""
+		Jump straight to the next due task and run it, `n` times.
+		Returns how many steps were actually run.
+		"""
+		assert self._parent is None, 'Child schedulers are updated by their parent'
+		assert isinstance(n, int) and n >= 0
+		done = 0
+		while done < n and not self._paused and self.timescale > 0:
+			when = self._queue.next_when()
+			if when is None:
+				if len(self._inbox) == 0 and len(self._completions) == 0:
+					break
+				when = self._time
+			self._advance_to(max(self._time, when))
+			done += 1
+		return done
+
+	def run_for(self, seconds: float) -> int:
+		"""
+		Advance `seconds` of scheduler time without waiting for the wall clock,
+		running every task due on the way. Returns how many steps were run.
+		"""
+		assert self._parent is None, 'Child schedulers are updated by their parent'
+		assert isinstance(seconds, (int, float)) and seconds >= 0
+		end = self._time + seconds
+		steps = 0
+		self._looping = True
+		try:
+			while self._looping and not self._paused and self.timescale > 0:
+				when = self._queue.next_when()
+				if len(self._inbox) > 0 or len(self._completions) > 0:
+					when = self._time
+				elif when is None or when > end:
+					break
+				self._advance_to(max(self._time, when), check_looping=True)
+				steps += 1
+			if self._looping:
+				self._advance_to(end, check_looping=True)
+		finally:
+			self._looping = False
+		return steps
+
+	def _loop_virtual(self):
+		self._looping = True
+		wake = self._wake_event
+		while self._looping:
+			wake.clear()
+			if self.step() > 0:
+				continue
+			if self._pending_futures == 0 and len(self._inbox) == 0 and len(self._frame_waiters) == 0:
+				break
+			# only pool work or frame waiters are left, they are resumed in real time
+			wake.wait(_IDLE_WAIT / 1e9)
+			self._advance_to(self._time, check_looping=True)
 
 	def loopUntilEmpty(self):
+		assert self._parent is None, 'Child schedulers are updated by their parent'
+		self._thread = get_ident()
+		if self._virtual:
+			self._loop_virtual()
+			return
 		self._looping = True
-		last = time.time()
-		while self._looping and len(self._jobs) > 0:
-			t = self._jobs[0]
-			st = (t.when - self._time) / self.timescale + last - time.time() + _sleep_offset
-			if st > 0:
-				time.sleep(st)
-			now = time.time()
-			self.update(now - last, check_looping=True)
+		pacer = self._pacer
+		wake = self._wake_event
+		last = pacer.now()
+		while self._looping:
+			# clear before checking the inbox, so a post racing with us still wakes the wait below
+			wake.clear()
+			when = self._queue.next_when()
+			if len(self._inbox) > 0 or (len(self._completions) > 0 and not self._paused):
+				pass
+			elif when is None and self._pending_futures == 0 and len(self._frame_waiters) == 0:
+				break
+			elif when is None or self._paused or self.timescale <= 0:
+				# nothing can become due, just idle until someone resumes us or a future completes
+				pacer.wait_until(last + _IDLE_WAIT, wake)
+			else:
+				pacer.wait_until(last + int((when - self._time) / self.timescale * 1e9), wake)
+			now = pacer.now()
+			self.update((now - last) / 1e9, check_looping=True)
 			last = now
 
+	def _notify(self):
+		parent = self._parent
+		if parent is not None:
+			# children are woken up through their parent
+			if not self._in_parent_tick:
+				parent.call_soon_threadsafe(self._parent_tick)
+			return
+		if self._is_foreign_thread():
+			self._wake_event.set()
+			loop = self._async_loop
+			if loop is not None:
+				loop.call_soon_threadsafe(self._resolve_wakeup)
+			return
+		self._resolve_wakeup()
+
+	def _resolve_wakeup(self):
+		wakeup = self._wakeup
+		if wakeup is not None and not wakeup.done():
+			wakeup.set_result(None)
+
+	def _spawn(self, awaitable):
+		if self._parent is not None:
+			# the root counts the callbacks, it is the one looping
+			self._parent._spawn(awaitable)
+			return
+		loop = self._async_loop
+		if loop is None:
+			try:
+				loop = asyncio.get_running_loop()
+			except RuntimeError:
+				if inspect.iscoroutine(awaitable):
+					awaitable.close()
+				raise RuntimeError('async callbacks require the scheduler to run inside an asyncio event loop') from None
+		task = asyncio.ensure_future(awaitable, loop=loop)
+		self._async_tasks.add(task)
+		task.add_done_callback(self._async_done)
+
+	def _async_done(self, task: asyncio.Task):
+		self._async_tasks.discard(task)
+		# `loop_async` may be waiting only for this task to finish
+		self._notify()
+
+	async def loop_async(self, *, forever: bool = False):
+		"""
+		Run the scheduler as a coroutine inside the running asyncio event loop.
+		Unless `forever` is set, it returns once no task is left.
+		"""
+		assert self._parent is None, 'Child schedulers are updated by their parent'
+		assert self._async_loop is None, 'Scheduler is already looping'
+		loop = asyncio.get_running_loop()
+		self._async_loop = loop
+		self._thread = get_ident()
+		self._looping = True
+		pacer = self._pacer
+		last = pacer.now()
+		try:
+			while self._looping:
+				when = self._queue.next_when()
+				timeout: float | None = None
+				if len(self._inbox) > 0 or (len(self._completions) > 0 and not self._paused):
+					timeout = 0
+				elif when is None:
+					# async callbacks still running may put new tasks, like `sleep` does
+					if not forever and self._pending_futures == 0 and len(self._frame_waiters) == 0 and len(self._async_tasks) == 0:
+						break
+				elif not self._paused and self.timescale > 0:
+					timeout = ((when - self._time) / self.timescale) - (pacer.now() - last) / 1e9
+				if timeout is None or timeout > 0:
+					wakeup = loop.create_future()
+					self._wakeup = wakeup
+					handle = None if timeout is None else loop.call_later(timeout, _resolve_future, wakeup)
+					try:
+						await wakeup
+					finally:
+						self._wakeup = None
+						if handle is not None:
+							handle.cancel()
+				else:
+					# give the other coroutines a chance even when we are running behind
+					await asyncio.sleep(0)
+				now = pacer.now()
+				self.update((now - last) / 1e9, check_looping=True)
+				last = now
+		finally:
+			self._async_loop = None
+
+	async def sleep(self, delay: float):
+		"""
+		Suspend the calling coroutine for `delay` seconds of scheduler time,
+		so it follows `timescale` and `pause`
+		"""
+		fut = asyncio.get_running_loop().create_future()
+		task = self.add_timeout(lambda: _resolve_future(fut), delay)
+		try:
+			await fut
+		finally:
+			task.cancel()
+
+def _resolve_future(fut: asyncio.Future):
+	if not fut.done():
+		fut.set_result(None)
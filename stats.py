@@ -0,0 +1,209 @@
+# Copyright (C) 2023 zyxkad@gmail.com
+
+from __future__ import annotations
+
+from collections import deque
+import csv
+import json
+import math
+from typing import IO
+
+from .resources import Anchor, Color, Colors, Font, Surface
+from .nodes import Node
+
+__all__ = [
+	'FrameStats',
+	'StatsOverlay',
+]
+
+class FrameStats:
+	"""
+	Keeps the phase timings of the last `window` frames.
+	`frame` is the sum of the phases, `interval` is the time since the previous frame started.
+	"""
+
+	PHASES = ('events', 'tasks', 'updates', 'draw', 'present')
+	TIMINGS = ('frame',) + PHASES + ('interval',)
+	COUNTS = ('drawn', 'culled', 'allocated')
+	COLUMNS = ('index',) + TIMINGS + COUNTS
+
+	def __init__(self, window: int = 600):
+		assert isinstance(window, int) and window > 0
+		self._records: deque[tuple[int, ...]] = deque(maxlen=window)
+		self._total = 0
+
+	def _add(self, events: int, tasks: int, updates: int, draw: int, present: int, interval: int,
+		drawn: int, culled: int, allocated: int):
+		frame = events + tasks + updates + draw + present
+		self._records.append((self._total, frame, events, tasks, updates, draw, present, interval, drawn, culled, allocated))
+		self._total += 1
+
+	@property
+	def window(self) -> int:
+		return self._records.maxlen or 0
+
+	@property
+	def total(self) -> int:
+		"""
+		How many frames were recorded since the last `clear`
+		"""
+		return self._total
+
+	def __len__(self) -> int:
+		return len(self._records)
+
+	def column(self, name: str) -> list[float]:
+		"""
+		Return the values of a column for the recorded frames, timings are in seconds
+		"""
+		i = self.COLUMNS.index(name)
+		if name in self.TIMINGS:
+			return [r[i] / 1e9 for r in self._records]
+		return [r[i] for r in self._records]
+
+	def mean(self, name: str = 'frame') -> float:
+		values = self.column(name)
+		if len(values) == 0:
+			return 0.0
+		return sum(values) / len(values)
+
+	def percentile(self, p: float, name: str = 'frame') -> float:
+		"""
+		Return the nearest-rank `p` percentile of a column, `p` is in range [0, 100]
+		"""
+		assert 0 <= p <= 100
+		values = sorted(self.column(name))
+		if len(values) == 0:
+			return 0.0
+		return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+	@property
+	def p50(self) -> float:
+		return self.percentile(50)
+
+	@property
+	def p95(self) -> float:
+		return self.percentile(95)
+
+	@property
+	def p99(self) -> float:
+		return self.percentile(99)
+
+	@property
+	def last(self) -> dict[str, float] | None:
+		if len(self._records) == 0:
+			return None
+		return self._to_dict(self._records[-1])
+
+	@property
+	def records(self) -> list[dict[str, float]]:
+		return [self._to_dict(r) for r in self._records]
+
+	def _to_dict(self, record: tuple[int, ...]) -> dict[str, float]:
+		timings = self.TIMINGS
+		return {name: v / 1e9 if name in timings else v for name, v in zip(self.COLUMNS, record)}
+
+	def summary(self) -> dict[str, dict[str, float]]:
+		"""
+		Return the mean, p50, p95, p99 and max of every column except `index`
+		"""
+		summary = {}
+		for name in self.COLUMNS[1:]:
+			values = sorted(self.column(name))
+			if len(values) == 0:
+				summary[name] = {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+				continue
+			def rank(p: float) -> float:
+				return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+			summary[name] = {
+				'mean': sum(values) / len(values),
+				'p50': rank(50),
+				'p95': rank(95),
+				'p99': rank(99),
+				'max': values[-1],
+			}
+		return summary
+
+	def to_csv(self, file: str | IO[str]):
+		"""
+		Write one row per recorded frame, timings are in seconds
+		"""
+		if isinstance(file, str):
+			with open(file, 'w', newline='') as fd:
+				self.to_csv(fd)
+			return
+		writer = csv.writer(file)
+		writer.writerow(self.COLUMNS)
+		for r in self.records:
+			writer.writerow(r.values())
+
+	def to_json(self, file: str | IO[str]):
+		"""
+		Write the summary and the recorded frames, timings are in seconds
+		"""
+		if isinstance(file, str):
+			with open(file, 'w') as fd:
+				self.to_json(fd)
+			return
+		json.dump({
+			'total': self._total,
+			'summary': self.summary(),
+			'frames': self.records,
+		}, file)
+
+	def clear(self):
+		self._records.clear()
+		self._total = 0
+
+	def __repr__(self) -> str:
+		return f'<FrameStats frames={len(self)} p50={self.p50 * 1e3:.3f}ms p95={self.p95 * 1e3:.3f}ms p99={self.p99 * 1e3:.3f}ms>'
+
+class StatsOverlay(Node):
+	"""
+	Shows the frame stats on the screen, put it into a `UILayer` so the camera does not move it.
+	The text is only redrawn every `interval` seconds.
+	"""
+
+	def __init__(self, stats: FrameStats, *, font: Font | None = None, color: Color = Colors.black,
+		interval: float = 0.5, anchor: Anchor = Anchor.TOP_LEFT, **kwargs):
+		assert isinstance(stats, FrameStats)
+		super().__init__(anchor=anchor, **kwargs)
+		self._stats = stats
+		self._font = font
+		self._color = color
+		self._lines: list[str] = []
+		self.schedule_update(interval)
+
+	@property
+	def stats(self) -> FrameStats:
+		return self._stats
+
+	@property
+	def lines(self) -> list[str]:
+		return self._lines.copy()
+
+	def on_update(self, dt: float):
+		stats = self._stats
+		last = stats.last
+		if last is None:
+			return
+		self._lines = [
+			f'frame p50 {stats.p50 * 1e3:.2f}ms p95 {stats.p95 * 1e3:.2f}ms p99 {stats.p99 * 1e3:.2f}ms',
+			' '.join(f'{name} {stats.mean(name) * 1e3:.2f}' for name in FrameStats.PHASES),
+			f'drawn {last["drawn"]} culled {last["culled"]} allocated {last["allocated"]}',
+		]
+		if self._font is None:
+			self._font = Font.default(14)
+		font = self._font.native
+		self.width = max(font.size(line)[0] for line in self._lines)
+		self.height = font.get_linesize() * len(self._lines)
+		self.invalidate()
+
+	def on_draw(self, surface: Surface):
+		if self._font is None:
+			return
+		font = self._font.native
+		y = 0
+		for line in self._lines:
+			surface.blit(font.render(line, True, self._color.rgba), (0, y), Anchor.TOP_LEFT)
+			y += font.get_linesize()